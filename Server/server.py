@@ -1,10 +1,21 @@
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
-import httpx
-import asyncio
 import logging
+import os
+import sys
+
+# Shared upstream helpers live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fastjson
+from admission import BATCH, INTERACTIVE, AdmissionController, Overloaded
+from instrumentation import PROMETHEUS_CONTENT_TYPE, REGISTRY, recent_traces
+from trip_upstreams import MAX_BATCH_TRIPS, create_trip_upstreams, section_statuses, trip_result
+from upstream_records import limit_offers
 
-app = FastAPI()
 logging.basicConfig(level=logging.INFO)
 
 # Define request schema
@@ -15,46 +26,134 @@ class TripRequest(BaseModel):
     end_date: str    # ISO format (YYYY-MM-DD)
     num_people: int
 
-# External API endpoints (replace with actual endpoints or use API gateways)
-MAPS_MCP_URL = "https://your-maps-mcp-server.com/api/maps"
-FLIGHT_API_URL = "https://your-flights-api.com/api/flights"
-HOTEL_API_URL = "https://your-hotels-api.com/api/hotels"
-UBER_API_URL = "https://your-transport-api.com/api/uber"
-
-async def fetch_data(client: httpx.AsyncClient, url: str, payload: dict, service_name: str):
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled client per upstream for the whole process, so requests reuse
+    # keep-alive connections instead of paying TCP+TLS handshakes every time
+    app.state.upstreams = create_trip_upstreams()
+    # Bounds concurrent itineraries; the excess queues briefly, then gets a 503
+    app.state.admission = AdmissionController()
     try:
-        response = await client.post(url, json=payload, timeout=10)
-        response.raise_for_status()
-        return response.json()
-    except httpx.HTTPError as http_err:
-        logging.error(f"HTTP error in {service_name}: {http_err}")
-        return {"error": f"HTTP error from {service_name}: {str(http_err)}"}
-    except Exception as e:
-        logging.error(f"Unhandled error in {service_name}: {e}")
-        return {"error": f"Unhandled error from {service_name}: {str(e)}"}
+        yield
+    finally:
+        await app.state.upstreams.aclose()
+
+app = FastAPI(lifespan=lifespan)
+
+
+def json_response(content) -> Response:
+    """Itineraries pre-encoded with fastjson (orjson when installed), skipping
+    FastAPI's jsonable_encoder pass over the whole payload."""
+    return Response(fastjson.dumps(content), media_type="application/json")
+
+
+@app.exception_handler(Overloaded)
+async def overloaded(request: Request, exc: Overloaded):
+    return JSONResponse({"error": str(exc), "reason": exc.reason}, status_code=503,
+                        headers={"Retry-After": str(exc.retry_after)})
+
+
+def lane_for(request: Request, default: str = INTERACTIVE) -> str:
+    """Priority lane from the ``X-Priority`` header (interactive or batch)."""
+    return request.headers.get("X-Priority", default).lower()
+
 
 @app.post("/plan-trip")
-async def plan_trip(trip: TripRequest):
+async def plan_trip(trip: TripRequest, request: Request, partial: bool = False,
+                    budget_ms: Optional[int] = Query(None, gt=0), limit: Optional[int] = Query(None, gt=0)):
+    """Plan a trip. ``budget_ms`` caps the wait on each upstream; with
+    ``partial=true`` an itinerary with some failed sections is still returned;
+    ``limit`` returns each section as compact records, cheapest N first."""
     payload = trip.dict()
-    async with httpx.AsyncClient() as client:
-        maps_task = fetch_data(client, MAPS_MCP_URL, payload, "Maps")
-        flight_task = fetch_data(client, FLIGHT_API_URL, payload, "Flights")
-        hotel_task = fetch_data(client, HOTEL_API_URL, payload, "Hotels")
-        uber_task = fetch_data(client, UBER_API_URL, payload, "Transport")
-
-        maps, flights, hotels, transport = await asyncio.gather(
-            maps_task, flight_task, hotel_task, uber_task
+    budget = budget_ms / 1000 if budget_ms is not None else None
+    async with request.app.state.admission.admit(lane_for(request)):
+        itinerary = await request.app.state.upstreams.fetch_itinerary(payload, budget)
+    if limit is not None:
+        itinerary = limit_offers(itinerary, limit)
+    sections = section_statuses(itinerary)
+
+    # Validate and clean errors from results
+    if "error" in sections.values():
+        if not partial or "ok" not in sections.values():
+            raise HTTPException(status_code=502, detail=itinerary)
+        return json_response({"status": "partial", "sections": sections, "itinerary": itinerary})
+
+    return json_response({"status": "success", "itinerary": itinerary})
+
+
+@app.post("/plan-trips")
+async def plan_trips(trips: List[TripRequest], request: Request, partial: bool = False,
+                     budget_ms: Optional[int] = Query(None, gt=0)):
+    """Plan a batch of trips. Results come back in input order, each with its own
+    status; identical upstream lookups across the batch are made once."""
+    if not trips or len(trips) > MAX_BATCH_TRIPS:
+        raise HTTPException(status_code=422, detail=f"Send between 1 and {MAX_BATCH_TRIPS} trips")
+    budget = budget_ms / 1000 if budget_ms is not None else None
+    async with request.app.state.admission.admit(lane_for(request, BATCH)):
+        itineraries, stats = await request.app.state.upstreams.fetch_itineraries(
+            [trip.dict() for trip in trips], budget
         )
+    return json_response({"results": [trip_result(itinerary, partial) for itinerary in itineraries], "stats": stats})
 
-    itinerary = {
-        "maps": maps,
-        "flights": flights,
-        "hotels": hotels,
-        "transport": transport
-    }
 
-    # Validate and clean errors from results
-    if any("error" in result for result in [maps, flights, hotels, transport]):
-        raise HTTPException(status_code=502, detail=itinerary)
+@app.post("/plan-trip/stream")
+async def plan_trip_stream(trip: TripRequest, request: Request,
+                           budget_ms: Optional[int] = Query(None, gt=0)):
+    """NDJSON stream: one line per itinerary section as it arrives, then a summary line."""
+    budget = budget_ms / 1000 if budget_ms is not None else None
+    # The slot is held until the stream ends; the background task covers a
+    # client that disconnects before the body starts
+    admission = request.app.state.admission
+    await admission.acquire(lane_for(request))
+    release = admission.releaser()
+
+    async def events():
+        try:
+            async for event in request.app.state.upstreams.stream_itinerary(trip.dict(), budget):
+                yield fastjson.dumps(event) + b"\n"
+        finally:
+            release()
+
+    return StreamingResponse(events(), media_type="application/x-ndjson", background=BackgroundTask(release))
+
+
+@app.get("/admission-stats")
+async def admission_stats(request: Request):
+    return request.app.state.admission.stats()
+
+
+@app.get("/upstream-pool")
+async def upstream_pool_stats(request: Request):
+    return request.app.state.upstreams.pool.stats()
+
+
+@app.get("/cache-stats")
+async def cache_stats(request: Request):
+    return await request.app.state.upstreams.cache_stats()
+
+
+@app.get("/coalescing-stats")
+async def coalescing_stats(request: Request):
+    return request.app.state.upstreams.coalescing_stats()
+
+
+@app.get("/latency-stats")
+async def latency_stats(request: Request):
+    return request.app.state.upstreams.latency_stats()
+
+
+@app.get("/breaker-stats")
+async def breaker_stats(request: Request):
+    return request.app.state.upstreams.breaker_stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text format: upstream latency histograms, in-flight gauges, error counters."""
+    return PlainTextResponse(REGISTRY.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
 
-    return {"status": "success", "itinerary": itinerary}
+@app.get("/traces")
+async def traces(limit: int = 20):
+    """Recent /plan-trip traces with their upstream child spans (needs TRACING=1)."""
+    return recent_traces(limit)
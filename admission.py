@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from instrumentation import ADMISSION_IN_FLIGHT, ADMISSION_QUEUE_DEPTH, ADMISSION_SHED
+
+logger = logging.getLogger(__name__)
+
+# Lanes in priority order: a freed slot always goes to the first non-empty lane
+INTERACTIVE = "interactive"
+BATCH = "batch"
+LANES = (INTERACTIVE, BATCH)
+
+MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "64"))
+QUEUE_LIMITS = {
+    INTERACTIVE: int(os.getenv("ADMISSION_QUEUE", "128")),
+    BATCH: int(os.getenv("ADMISSION_BATCH_QUEUE", "32")),
+}
+QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2.0"))
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed; ``retry_after`` is a hint in whole seconds."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Server overloaded ({reason}), retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Caps in-flight work, with a bounded priority queue in front of it.
+
+    Up to ``max_in_flight`` requests run at once. Further requests wait in
+    their lane's queue for at most ``queue_timeout`` seconds; a full queue
+    or an expired wait raises ``Overloaded`` straight away, which servers
+    turn into a 503 with ``Retry-After``. Freed slots are handed to the
+    oldest waiter of the highest-priority lane, so batch work only runs
+    when no interactive request is waiting.
+
+    Must be used from a single event loop.
+    """
+
+    def __init__(self, max_in_flight: int = MAX_IN_FLIGHT, queue_limits: dict = None,
+                 queue_timeout: float = QUEUE_TIMEOUT):
+        self.max_in_flight = max_in_flight
+        self.queue_limits = dict(queue_limits or QUEUE_LIMITS)
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._queues = {lane: deque() for lane in LANES}
+        self._avg_hold = None
+        self._stats = {lane: {"admitted": 0, "queued": 0, "shed_queue_full": 0, "shed_timeout": 0} for lane in LANES}
+
+    def _lane(self, lane: str) -> str:
+        return lane if lane in self._queues else INTERACTIVE
+
+    def retry_after(self) -> int:
+        """Rough seconds until a slot frees up, from recent hold times and the queue length."""
+        queued = sum(len(queue) for queue in self._queues.values())
+        hold = self._avg_hold if self._avg_hold is not None else self.queue_timeout
+        return max(1, math.ceil(hold * (queued + 1) / self.max_in_flight))
+
+    def _shed(self, lane: str, reason: str):
+        self._stats[lane][f"shed_{reason}"] += 1
+        ADMISSION_SHED.inc(lane=lane, reason=reason)
+        raise Overloaded(reason, self.retry_after())
+
+    def _update_gauges(self):
+        ADMISSION_IN_FLIGHT.set(self.in_flight)
+        for lane, queue in self._queues.items():
+            ADMISSION_QUEUE_DEPTH.set(len(queue), lane=lane)
+
+    async def acquire(self, lane: str = INTERACTIVE):
+        """Wait for a slot, or raise ``Overloaded`` if the lane is full or the wait expires."""
+        lane = self._lane(lane)
+        # Only take a free slot directly if nobody of equal or higher priority is waiting
+        ahead = any(self._queues[other] for other in LANES[:LANES.index(lane) + 1])
+        if self.in_flight < self.max_in_flight and not ahead:
+            self.in_flight += 1
+            self._stats[lane]["admitted"] += 1
+            self._update_gauges()
+            return
+
+        queue = self._queues[lane]
+        if len(queue) >= self.queue_limits.get(lane, 0):
+            self._shed(lane, "queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        queue.append(waiter)
+        self._stats[lane]["queued"] += 1
+        self._update_gauges()
+        try:
+            await asyncio.wait({waiter}, timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            # The caller went away; pass on a slot that was already handed over
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                self._forget(queue, waiter)
+            raise
+        if not waiter.done():
+            self._forget(queue, waiter)
+            self._shed(lane, "timeout")
+        # release() transferred its slot to us, so in_flight is already counted
+        self._stats[lane]["admitted"] += 1
+
+    def _forget(self, queue: deque, waiter: asyncio.Future):
+        waiter.cancel()
+        try:
+            queue.remove(waiter)
+        except ValueError:
+            pass
+        self._update_gauges()
+
+    def release(self, held_for: float = None):
+        if held_for is not None:
+            self._avg_hold = held_for if self._avg_hold is None else 0.9 * self._avg_hold + 0.1 * held_for
+        for lane in LANES:
+            queue = self._queues[lane]
+            while queue:
+                waiter = queue.popleft()
+                if not waiter.done():
+                    waiter.set_result(None)
+                    self._update_gauges()
+                    return
+        self.in_flight -= 1
+        self._update_gauges()
+
+    @asynccontextmanager
+    async def admit(self, lane: str = INTERACTIVE):
+        """``async with controller.admit(lane):`` run the block in an admitted slot."""
+        await self.acquire(lane)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - start)
+
+    def releaser(self):
+        """An idempotent release for a slot held across callbacks, e.g. a streamed response."""
+        start = time.perf_counter()
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                self.release(time.perf_counter() - start)
+
+        return release
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queue_timeout": self.queue_timeout,
+            "avg_hold_ms": round(self._avg_hold * 1000, 1) if self._avg_hold is not None else None,
+            "lanes": {
+                lane: {**self._stats[lane], "queue_depth": len(self._queues[lane]),
+                       "queue_limit": self.queue_limits.get(lane, 0)}
+                for lane in LANES
+            },
+        }
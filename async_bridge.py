@@ -0,0 +1,138 @@
+import asyncio
+import concurrent.futures
+import logging
+import os
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncBridge:
+    """A long-lived event loop on a background thread for synchronous apps.
+
+    Sync request handlers (e.g. Flask views) submit coroutines with ``run``
+    instead of creating a new event loop per request, so async resources such
+    as pooled HTTP clients live as long as the process. The loop is started
+    lazily and restarted after a fork, giving one loop per worker process.
+    """
+
+    def __init__(self, name: str = "async-bridge"):
+        self.name = name
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._pid = None
+        self._shutdown_callbacks = []
+
+    def on_shutdown(self, callback):
+        """Register a coroutine function to await on the loop before it stops."""
+        self._shutdown_callbacks.append(callback)
+        return callback
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is not None and self._pid == os.getpid():
+                return self._loop
+            # Either never started or we are in a forked child whose copy of
+            # the loop has no thread behind it
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run_loop():
+                asyncio.set_event_loop(loop)
+                loop.call_soon(ready.set)
+                loop.run_forever()
+
+            thread = threading.Thread(target=run_loop, name=self.name, daemon=True)
+            thread.start()
+            ready.wait()
+            self._loop, self._thread, self._pid = loop, thread, os.getpid()
+            logger.info(f"Started {self.name} event loop in process {self._pid}")
+            return loop
+
+    def submit(self, coro):
+        """Schedule ``coro`` on the bridge loop and return a concurrent Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_started())
+
+    def call_soon(self, callback, *args):
+        """Run a plain callback on the bridge loop, e.g. to touch state owned by that loop."""
+        self._ensure_started().call_soon_threadsafe(callback, *args)
+
+    def run(self, coro, timeout: float = None):
+        """Run ``coro`` on the bridge loop and block until it finishes."""
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def call(self, fn, *args, timeout: float = None):
+        """Run ``fn(*args)`` on the bridge loop, e.g. to snapshot state owned by that loop."""
+        async def invoke():
+            return fn(*args)
+
+        return self.run(invoke(), timeout)
+
+    def iterate(self, aiterable, timeout: float = None):
+        """Consume an async iterable on the bridge loop, yielding its items here.
+
+        ``timeout`` bounds the wait for each item. Closing the returned
+        generator early cancels the producer on the loop.
+        """
+        items = queue.Queue()
+        finished = object()
+
+        async def pump():
+            try:
+                async for item in aiterable:
+                    items.put((True, item))
+            except Exception as e:
+                items.put((False, e))
+            finally:
+                items.put((True, finished))
+
+        future = self.submit(pump())
+        try:
+            while True:
+                try:
+                    ok, item = items.get(timeout=timeout)
+                except queue.Empty:
+                    raise TimeoutError(f"No item from {self.name} within {timeout}s")
+                if not ok:
+                    raise item
+                if item is finished:
+                    return
+                yield item
+        finally:
+            future.cancel()
+
+    def stop(self, timeout: float = 5.0):
+        """Run shutdown callbacks, cancel leftover tasks and close the loop."""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            if loop is None or self._pid != os.getpid():
+                return
+            self._loop = self._thread = self._pid = None
+
+        async def shutdown():
+            for callback in self._shutdown_callbacks:
+                try:
+                    await callback()
+                except Exception as e:
+                    logger.error(f"Error in {self.name} shutdown callback: {e}")
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await loop.shutdown_asyncgens()
+
+        try:
+            asyncio.run_coroutine_threadsafe(shutdown(), loop).result(timeout)
+        except Exception as e:
+            logger.error(f"Error shutting down {self.name}: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
+        if not loop.is_running():
+            loop.close()
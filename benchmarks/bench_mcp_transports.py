@@ -0,0 +1,147 @@
+"""Compare MCPClient overhead over the stdio and SSE transports, fully offline.
+
+Usage: python benchmarks/bench_mcp_transports.py [--transports stdio,sse]
+       [--delay-ms 0] [--size 1024] [--calls 200] [--concurrency 16]
+
+Both transports talk to ``fake_mcp_server.py`` (tools with a configurable
+delay and payload size) and the model calls go to ``stub_model.py``, so
+no network access or API key is needed. One JSON line per transport
+reports connect (spawn/handshake + initialize + first list_tools),
+list_tools and call_tool round trips, concurrent call throughput over
+one session, and a full ``process_query`` tool loop.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+FAKE_SERVER = os.path.join(BENCH_DIR, "fake_mcp_server.py")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "mcp-client"))
+
+from stub_model import running_stub_model  # noqa: E402
+
+
+def summarize(samples: list) -> dict:
+    samples = sorted(samples)
+    return {
+        "n": len(samples),
+        "p50_ms": round(statistics.median(samples) * 1000, 3),
+        "p95_ms": round(samples[math.ceil(len(samples) * 0.95) - 1] * 1000, 3),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+    }
+
+
+async def timed(coro_fn, repeats: int) -> list:
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        await coro_fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def wait_for_port(port: int, process: subprocess.Popen, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"fake MCP server exited with code {process.returncode}")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"fake MCP server did not listen on {port} within {timeout}s")
+
+
+async def bench_transport(transport: str, target: str, args) -> dict:
+    from client import MCPClient
+
+    client = MCPClient()
+    start = time.perf_counter()
+    await client.connect_to_server(target)
+    connect = time.perf_counter() - start
+    tool_args = {"size": args.size, "delay_ms": args.delay_ms}
+    try:
+        list_tools = await timed(client.session.list_tools, args.repeats)
+        ping = await timed(lambda: client.call_tool("ping", {}), args.repeats)
+        call_tool = await timed(lambda: client.call_tool("fetch_payload", tool_args), args.repeats)
+
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def limited_call():
+            async with semaphore:
+                await client.call_tool("fetch_payload", tool_args)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(limited_call() for _ in range(args.calls)))
+        elapsed = time.perf_counter() - start
+
+        queries = await timed(lambda: client.process_query("benchmark"), max(1, args.repeats // 10))
+    finally:
+        await client.clenup()
+
+    return {
+        "transport": transport,
+        "payload_bytes": args.size,
+        "tool_delay_ms": args.delay_ms,
+        "connect_ms": round(connect * 1000, 1),
+        "list_tools": summarize(list_tools),
+        "ping": summarize(ping),
+        "call_tool": summarize(call_tool),
+        "concurrent_calls": args.calls,
+        "concurrency": args.concurrency,
+        "throughput_calls_per_s": round(args.calls / elapsed, 1),
+        "process_query": summarize(queries),
+    }
+
+
+def run(transport: str, args) -> dict:
+    server_args = f"--delay-ms {args.delay_ms} --size {args.size}"
+    if transport == "stdio":
+        return asyncio.run(bench_transport(transport, f"{FAKE_SERVER} {server_args}", args))
+
+    process = subprocess.Popen(
+        [sys.executable, FAKE_SERVER, *server_args.split(), "--transport", "sse", "--port", str(args.sse_port)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_port(args.sse_port, process)
+        return asyncio.run(bench_transport(transport, f"http://127.0.0.1:{args.sse_port}/sse", args))
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transports", default="stdio,sse")
+    parser.add_argument("--delay-ms", type=float, default=0.0, help="server-side delay per fetch_payload call")
+    parser.add_argument("--size", type=int, default=1024, help="fetch_payload response size in bytes")
+    parser.add_argument("--repeats", type=int, default=50, help="sequential samples per round-trip metric")
+    parser.add_argument("--calls", type=int, default=200, help="calls in the concurrent throughput run")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--sse-port", type=int, default=8766)
+    parser.add_argument("--model-port", type=int, default=8767)
+    args = parser.parse_args()
+
+    with running_stub_model(port=args.model_port) as model_url:
+        # MCPClient builds its AsyncAnthropic from the environment
+        os.environ["ANTHROPIC_BASE_URL"] = model_url
+        os.environ["ANTHROPIC_API_KEY"] = "offline-benchmark"
+        logging.disable(logging.INFO)
+        for transport in args.transports.split(","):
+            print(json.dumps(run(transport, args)), flush=True)
+
+
+if __name__ == "__main__":
+    main()
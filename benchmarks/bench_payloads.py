@@ -0,0 +1,152 @@
+"""Bytes per /plan-trip response and JSON time, raw upstream blobs vs compact records.
+
+Usage: python benchmarks/bench_payloads.py [--flights 150] [--hotels 100] [--iterations 200]
+
+Builds realistic, verbose upstream responses for the four services and
+times the per-request JSON work both ways:
+
+  before  stdlib json decode of each upstream body, itinerary embeds the
+          four blobs verbatim, stdlib json encode of the response
+  after   fastjson (orjson when installed) decode, projection onto compact
+          records with the default cheapest-N limits (what the servers do
+          with COMPACT_UPSTREAM_PAYLOADS=1), fastjson encode
+
+One JSON line per mode with the response size and per-stage timings.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import fastjson  # noqa: E402
+from upstream_records import compact_result  # noqa: E402
+
+AIRLINES = ["Delta", "United", "American", "Southwest", "JetBlue", "Alaska", "Spirit", "Frontier"]
+
+
+def flight_response(rnd: random.Random, count: int) -> dict:
+    flights = []
+    for i in range(count):
+        stops = rnd.randrange(3)
+        flights.append({
+            "airline": rnd.choice(AIRLINES),
+            "flight_number": f"{rnd.randrange(100, 9999)}",
+            "departure_time": f"2026-06-01T{rnd.randrange(24):02d}:{rnd.randrange(60):02d}:00",
+            "arrival_time": f"2026-06-01T{rnd.randrange(24):02d}:{rnd.randrange(60):02d}:00",
+            "duration": f"{rnd.randrange(2, 9)}h {rnd.randrange(60)}m",
+            "stops": stops,
+            "price": f"${rnd.randrange(89, 1200)}",
+            "segments": [{
+                "from": "ATL", "to": "LAS", "aircraft": "Boeing 737-900", "cabin": "economy",
+                "seat_pitch": "31 in", "wifi": True, "power": True, "entertainment": "streaming",
+                "operated_by": rnd.choice(AIRLINES), "carbon_kg": rnd.randrange(80, 400),
+            } for _ in range(stops + 1)],
+            "baggage": {"carry_on": "1 included", "checked": "$35 first bag, $45 second bag"},
+            "fare_rules": "Non-refundable. Changes permitted for a fee. " * 4,
+            "booking_token": "".join(rnd.choice("abcdef0123456789") for _ in range(120)),
+        })
+    return {"search_metadata": {"id": "search-1", "status": "Success"}, "flights": flights}
+
+
+def hotel_response(rnd: random.Random, count: int) -> dict:
+    return {"hotels": [{
+        "name": f"Hotel {i}",
+        "address": f"{rnd.randrange(1, 9999)} Las Vegas Blvd S, Las Vegas, NV",
+        "rating": round(rnd.uniform(2.5, 5.0), 1),
+        "price": {"amount": rnd.randrange(60, 900), "currency": "USD"},
+        "description": "Spacious rooms with city views, a rooftop pool and an on-site spa. " * 5,
+        "amenities": ["wifi", "pool", "spa", "gym", "parking", "restaurant", "bar", "room service"],
+        "images": [f"https://images.example.com/hotels/{i}/{n}.jpg" for n in range(12)],
+        "reviews": [{"author": f"guest{n}", "text": "Great stay, friendly staff. " * 3} for n in range(5)],
+    } for i in range(count)]}
+
+
+def transport_response(rnd: random.Random) -> dict:
+    return {"prices": [{
+        "display_name": name,
+        "estimate": f"${rnd.randrange(15, 90)}-{rnd.randrange(90, 140)}",
+        "duration": f"{rnd.randrange(10, 40)} min",
+        "distance": f"{rnd.uniform(3, 20):.1f} mi",
+        "surge_multiplier": 1.0,
+        "product_id": "".join(rnd.choice("abcdef0123456789") for _ in range(36)),
+    } for name in ("UberX", "UberXL", "Comfort", "Black", "Green", "Pet", "Assist", "WAV")]}
+
+
+def maps_response(rnd: random.Random) -> dict:
+    return {"routes": [{
+        "summary": f"I-15 N route {r}",
+        "distance": f"{rnd.uniform(3, 20):.1f} mi",
+        "duration": f"{rnd.randrange(10, 40)} min",
+        "polyline": "".join(rnd.choice("abcdefghijklmnopqrstuvwxyz_@?~") for _ in range(4000)),
+        "steps": [{"instruction": "Continue straight onto Las Vegas Blvd", "distance": "0.4 mi"}
+                  for _ in range(40)],
+    } for r in range(3)]}
+
+
+def upstream_bodies(args) -> dict:
+    rnd = random.Random(0)
+    responses = {
+        "Maps": maps_response(rnd),
+        "Flights": flight_response(rnd, args.flights),
+        "Hotels": hotel_response(rnd, args.hotels),
+        "Transport": transport_response(rnd),
+    }
+    return {service: json.dumps(response).encode() for service, response in responses.items()}
+
+
+def run_mode(mode: str, bodies: dict, iterations: int) -> dict:
+    decode = project = encode = 0.0
+    body = b""
+    for _ in range(iterations):
+        start = time.perf_counter()
+        if mode == "before":
+            results = {service: json.loads(raw) for service, raw in bodies.items()}
+        else:
+            results = {service: fastjson.loads(raw) for service, raw in bodies.items()}
+        decode += time.perf_counter() - start
+
+        start = time.perf_counter()
+        if mode == "after":
+            results = {service: compact_result(service, result) for service, result in results.items()}
+        itinerary = {service.lower(): result for service, result in results.items()}
+        project += time.perf_counter() - start
+
+        start = time.perf_counter()
+        if mode == "before":
+            body = json.dumps({"status": "success", "itinerary": itinerary}).encode()
+        else:
+            body = fastjson.dumps({"status": "success", "itinerary": itinerary})
+        encode += time.perf_counter() - start
+
+    per_request = lambda seconds: round(seconds / iterations * 1000, 3)  # noqa: E731
+    return {
+        "mode": mode,
+        "orjson": fastjson.HAS_ORJSON if mode == "after" else False,
+        "upstream_bytes": sum(len(raw) for raw in bodies.values()),
+        "response_bytes": len(body),
+        "decode_ms": per_request(decode),
+        "project_ms": per_request(project),
+        "encode_ms": per_request(encode),
+        "total_ms": per_request(decode + project + encode),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--flights", type=int, default=150)
+    parser.add_argument("--hotels", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    bodies = upstream_bodies(args)
+    for mode in ("before", "after"):
+        print(json.dumps(run_mode(mode, bodies, args.iterations)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""Load-test the Flask (web.py) and FastAPI (Server/server.py) trip servers.
+
+Usage: python benchmarks/bench_trip_servers.py [--apps flask,fastapi]
+       [--scenarios fast,lognormal,flaky,slow-flights] [--duration 10]
+       [--concurrency 32] [--unique 500] [--no-cache] [--output results.jsonl]
+
+For every scenario the stub upstreams (see ``stub_upstreams.SCENARIOS``)
+and each app run as separate processes, the app pointed at the stubs
+through its endpoint environment variables. A pool of concurrent clients
+then posts trips for ``--duration`` seconds; one JSON line per app and
+scenario reports throughput, status counts and p50/p95/p99 latency.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from stub_upstreams import SCENARIOS, stub_env  # noqa: E402
+
+APPS = {
+    "flask": [sys.executable, "-m", "flask", "--app", "web", "run", "--with-threads", "--port", "{port}"],
+    "fastapi": [sys.executable, "-m", "uvicorn", "server:app", "--app-dir", "Server",
+                "--log-level", "warning", "--port", "{port}"],
+}
+STARTUP_TIMEOUT = 30
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(q * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def trip_payloads(unique: int, seed: int = 0) -> list:
+    """``unique`` distinct trips; cycling through them gives a controllable cache hit rate."""
+    rnd = random.Random(seed)
+    airports = ["ATL", "LAS", "JFK", "SFO", "ORD", "SEA", "MIA", "DEN"]
+    trips = []
+    for _ in range(unique):
+        origin, destination = rnd.sample(airports, 2)
+        start = date(2026, 1, 1) + timedelta(days=rnd.randrange(365))
+        trips.append({
+            "origin": origin,
+            "destination": destination,
+            "start_date": start.isoformat(),
+            "end_date": (start + timedelta(days=rnd.randrange(1, 14))).isoformat(),
+            "num_people": rnd.randrange(1, 6),
+        })
+    return trips
+
+
+def start_process(command: list, env: dict) -> subprocess.Popen:
+    return subprocess.Popen(command, cwd=ROOT, env={**os.environ, **env},
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def stop_process(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def wait_until_up(url: str, process: subprocess.Popen):
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode} during startup")
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up within {STARTUP_TIMEOUT}s")
+
+
+async def generate_load(url: str, trips: list, concurrency: int, duration: float) -> dict:
+    """Closed-loop load: ``concurrency`` clients, each sending its next request as soon as the last returns."""
+    latencies = []
+    statuses = {}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=60.0) as client:
+        deadline = time.perf_counter() + duration
+
+        async def worker(offset):
+            sent = offset
+            while time.perf_counter() < deadline:
+                trip = trips[sent % len(trips)]
+                sent += concurrency
+                start = time.perf_counter()
+                try:
+                    response = await client.post(url, json=trip)
+                    status = str(response.status_code)
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                latencies.append(time.perf_counter() - start)
+                statuses[status] = statuses.get(status, 0) + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "statuses": statuses,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+    }
+
+
+def run_scenario(app: str, scenario: str, args, trips: list) -> dict:
+    stub = start_process([sys.executable, os.path.join("benchmarks", "stub_upstreams.py"),
+                          "--port", str(args.stub_port), "--scenario", scenario], {})
+    env = {**stub_env(args.stub_port), "RESPONSE_CACHE": "0" if args.no_cache else "1"}
+    server = start_process([part.format(port=args.app_port) for part in APPS[app]], env)
+    try:
+        wait_until_up(f"http://127.0.0.1:{args.stub_port}/docs", stub)
+        wait_until_up(f"http://127.0.0.1:{args.app_port}/cache-stats", server)
+        url = f"http://127.0.0.1:{args.app_port}{args.endpoint}"
+        result = asyncio.run(generate_load(url, trips, args.concurrency, args.duration))
+    finally:
+        stop_process(server)
+        stop_process(stub)
+    return {
+        "app": app,
+        "scenario": scenario,
+        "endpoint": args.endpoint,
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "unique_trips": len(trips),
+        "response_cache": not args.no_cache,
+        **result,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--apps", default=",".join(APPS), help="comma-separated: flask, fastapi")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated stub scenarios")
+    parser.add_argument("--endpoint", default="/plan-trip?partial=true")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of load per app and scenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--unique", type=int, default=500, help="distinct trips to cycle through")
+    parser.add_argument("--no-cache", action="store_true", help="run the apps with RESPONSE_CACHE=0")
+    parser.add_argument("--stub-port", type=int, default=8765)
+    parser.add_argument("--app-port", type=int, default=8080)
+    parser.add_argument("--output", help="also append the JSON lines to this file")
+    args = parser.parse_args()
+
+    trips = trip_payloads(args.unique)
+    for scenario in args.scenarios.split(","):
+        for app in args.apps.split(","):
+            line = json.dumps(run_scenario(app, scenario, args, trips))
+            print(line, flush=True)
+            if args.output:
+                with open(args.output, "a") as f:
+                    f.write(line + "\n")
+
+
+if __name__ == "__main__":
+    main()
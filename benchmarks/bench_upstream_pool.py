@@ -0,0 +1,94 @@
+"""Compare a fresh httpx client per /plan-trip against the shared UpstreamPool.
+
+Usage: python benchmarks/bench_upstream_pool.py [--requests 500] [--concurrency 50]
+
+Both modes drive ``fetch_data`` from ``trip_upstreams`` against local stub
+upstreams and report new TCP connections (== TLS handshakes against https
+upstreams) and per-itinerary latency.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from trip_upstreams import fetch_data  # noqa: E402
+from upstream_pool import UpstreamPool  # noqa: E402
+from stub_upstreams import running_stub_upstreams  # noqa: E402
+
+PAYLOAD = {
+    "origin": "ATL",
+    "destination": "LAS",
+    "start_date": "2025-06-01",
+    "end_date": "2025-06-05",
+    "num_people": 2,
+}
+
+
+async def plan(pool: UpstreamPool, urls: dict):
+    return await asyncio.gather(*(
+        fetch_data(pool.client(service), url, PAYLOAD, service) for service, url in urls.items()
+    ))
+
+
+async def run_mode(mode: str, urls: dict, requests: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    tcp_connects = 0
+    shared = UpstreamPool() if mode == "pooled" else None
+
+    async def one():
+        nonlocal tcp_connects
+        async with semaphore:
+            pool = shared or UpstreamPool()
+            start = time.perf_counter()
+            results = await plan(pool, urls)
+            latencies.append(time.perf_counter() - start)
+            if any("error" in result for result in results):
+                raise RuntimeError(f"stub upstream failed: {results}")
+            if shared is None:
+                tcp_connects += sum(s["tcp_connects"] for s in pool.stats().values())
+                await pool.aclose()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    if shared is not None:
+        tcp_connects = sum(s["tcp_connects"] for s in shared.stats().values())
+        await shared.aclose()
+
+    latencies.sort()
+    return {
+        "mode": mode,
+        "requests": requests,
+        "concurrency": concurrency,
+        "tcp_connects": tcp_connects,
+        "throughput_rps": round(requests / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.0, help="stub upstream latency in seconds")
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    with running_stub_upstreams(port=args.port, delay=args.delay) as urls:
+        for mode in ("per-request", "pooled"):
+            result = asyncio.run(run_mode(mode, urls, args.requests, args.concurrency))
+            print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Deterministic MCP server for transport benchmarks; needs no network or API keys.
+
+Usage: python benchmarks/fake_mcp_server.py [--delay-ms 0] [--size 1024]
+       [--transport stdio|sse] [--port 8766]
+
+Tools:
+  ping()                           returns "pong" immediately
+  fetch_payload(size, delay_ms)    waits ``delay_ms`` and returns ``size`` bytes of JSON
+
+``--delay-ms`` and ``--size`` set the defaults used when a call omits them.
+"""
+import argparse
+import asyncio
+import json
+
+from mcp.server.fastmcp import FastMCP
+
+parser = argparse.ArgumentParser(description="Fake MCP server for benchmarks")
+parser.add_argument("--delay-ms", type=float, default=0.0)
+parser.add_argument("--size", type=int, default=1024)
+parser.add_argument("--transport", choices=["stdio", "sse"], default="stdio")
+parser.add_argument("--host", default="127.0.0.1")
+parser.add_argument("--port", type=int, default=8766)
+args = parser.parse_args()
+
+mcp = FastMCP("fake-mcp", host=args.host, port=args.port, log_level="WARNING")
+
+
+@mcp.tool()
+async def ping() -> str:
+    """Return immediately; measures pure round-trip overhead."""
+    return "pong"
+
+
+@mcp.tool()
+async def fetch_payload(size: int = None, delay_ms: float = None) -> str:
+    """Wait ``delay_ms`` milliseconds, then return a JSON document of about ``size`` bytes."""
+    size = args.size if size is None else size
+    delay_ms = args.delay_ms if delay_ms is None else delay_ms
+    if delay_ms:
+        await asyncio.sleep(delay_ms / 1000)
+    body = json.dumps({"size": size, "data": ""})
+    return json.dumps({"size": size, "data": "x" * max(0, size - len(body))})
+
+
+if __name__ == "__main__":
+    mcp.run(transport=args.transport)
@@ -0,0 +1,107 @@
+"""Offline stand-in for the Anthropic Messages API.
+
+``POST /v1/messages`` answers deterministically: while the conversation
+has no tool results yet it asks for one call of ``fetch_payload`` (or the
+first tool offered), afterwards it replies with a short text. Streaming
+and non-streaming requests are both supported, so ``MCPClient`` runs its
+full tool loop against it with ``ANTHROPIC_BASE_URL`` pointed here.
+
+Run standalone with ``python benchmarks/stub_model.py`` or in-process with
+``running_stub_model()``.
+"""
+import asyncio
+import contextlib
+import json
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+PREFERRED_TOOL = "fetch_payload"
+
+
+def _has_tool_results(messages: list) -> bool:
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, list) and any(block.get("type") == "tool_result" for block in content):
+            return True
+    return False
+
+
+def _reply(body: dict) -> dict:
+    """The assistant message this stub answers ``body`` with."""
+    tools = [tool for tool in body.get("tools", []) if "name" in tool]
+    tool_choice = (body.get("tool_choice") or {}).get("type")
+    usage = {"input_tokens": len(json.dumps(body)) // 4, "output_tokens": 10}
+    message = {"id": "msg_stub", "type": "message", "role": "assistant", "model": body.get("model", "stub"),
+               "stop_sequence": None, "usage": usage}
+
+    if tools and tool_choice != "none" and not _has_tool_results(body.get("messages", [])):
+        names = [tool["name"] for tool in tools]
+        name = PREFERRED_TOOL if PREFERRED_TOOL in names else names[0]
+        return {**message, "stop_reason": "tool_use",
+                "content": [{"type": "tool_use", "id": "toolu_stub_1", "name": name, "input": {}}]}
+    return {**message, "stop_reason": "end_turn", "content": [{"type": "text", "text": "Done."}]}
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _stream(message: dict):
+    yield _sse("message_start", {"type": "message_start", "message": {
+        **message, "content": [], "stop_reason": None, "usage": {**message["usage"], "output_tokens": 0}}})
+    for index, block in enumerate(message["content"]):
+        if block["type"] == "tool_use":
+            yield _sse("content_block_start", {"type": "content_block_start", "index": index,
+                                               "content_block": {**block, "input": {}}})
+            delta = {"type": "input_json_delta", "partial_json": json.dumps(block["input"])}
+        else:
+            yield _sse("content_block_start", {"type": "content_block_start", "index": index,
+                                               "content_block": {"type": "text", "text": ""}})
+            delta = {"type": "text_delta", "text": block["text"]}
+        yield _sse("content_block_delta", {"type": "content_block_delta", "index": index, "delta": delta})
+        yield _sse("content_block_stop", {"type": "content_block_stop", "index": index})
+    yield _sse("message_delta", {"type": "message_delta",
+                                 "delta": {"stop_reason": message["stop_reason"], "stop_sequence": None},
+                                 "usage": {"output_tokens": message["usage"]["output_tokens"]}})
+    yield _sse("message_stop", {"type": "message_stop"})
+
+
+def create_stub_model_app(delay: float = 0.0) -> FastAPI:
+    """``delay`` seconds pass before the first byte of every response."""
+    app = FastAPI()
+
+    @app.post("/v1/messages")
+    async def messages(request: Request):
+        body = await request.json()
+        if delay:
+            await asyncio.sleep(delay)
+        message = _reply(body)
+        if body.get("stream"):
+            return StreamingResponse(_stream(message), media_type="text/event-stream")
+        return message
+
+    return app
+
+
+@contextlib.contextmanager
+def running_stub_model(port: int = 8767, delay: float = 0.0, host: str = "127.0.0.1"):
+    """Serve the stub model on a background thread; yields its base URL."""
+    config = uvicorn.Config(create_stub_model_app(delay), host=host, port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    try:
+        yield f"http://{host}:{port}"
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+if __name__ == "__main__":
+    uvicorn.run(create_stub_model_app(), host="127.0.0.1", port=8767)
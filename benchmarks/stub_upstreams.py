@@ -0,0 +1,142 @@
+"""Local stand-ins for the maps, flights, hotels and uber upstreams.
+
+Run standalone with ``python benchmarks/stub_upstreams.py [--scenario flaky]``
+or start them in-process with ``running_stub_upstreams()`` from a benchmark.
+Point a trip server at them with the variables from ``stub_env()``.
+"""
+import argparse
+import asyncio
+import contextlib
+import random
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+SERVICES = ["maps", "flights", "hotels", "uber"]
+
+# trip_upstreams reads each endpoint from these variables
+URL_ENV_VARS = {
+    "Maps": "MAPS_MCP_URL",
+    "Flights": "FLIGHT_API_URL",
+    "Hotels": "HOTEL_API_URL",
+    "Transport": "UBER_API_URL",
+}
+
+
+class StubProfile:
+    """Latency distribution and error rate of one stub upstream.
+
+    ``latency`` is ``fixed`` (always ``mean``), ``uniform`` (``mean`` +/-
+    ``spread``), ``lognormal`` (median ``mean``, sigma ``spread``) or
+    ``exponential`` (mean ``mean``). All times are in seconds.
+    """
+
+    def __init__(self, latency: str = "fixed", mean: float = 0.0, spread: float = 0.0, error_rate: float = 0.0):
+        if latency not in ("fixed", "uniform", "lognormal", "exponential"):
+            raise ValueError(f"Unknown latency distribution {latency}")
+        self.latency = latency
+        self.mean = mean
+        self.spread = spread
+        self.error_rate = error_rate
+
+    def sample(self) -> float:
+        if self.mean <= 0:
+            return 0.0
+        if self.latency == "uniform":
+            return random.uniform(max(0.0, self.mean - self.spread), self.mean + self.spread)
+        if self.latency == "lognormal":
+            return self.mean * random.lognormvariate(0.0, self.spread)
+        if self.latency == "exponential":
+            return random.expovariate(1.0 / self.mean)
+        return self.mean
+
+    def fails(self) -> bool:
+        return random.random() < self.error_rate
+
+
+# Named setups for the load benchmarks: service -> profile, "*" for the rest
+SCENARIOS = {
+    "fast": {"*": StubProfile("fixed", 0.005)},
+    "lognormal": {"*": StubProfile("lognormal", 0.05, 0.5)},
+    "flaky": {"*": StubProfile("uniform", 0.02, 0.01, error_rate=0.05)},
+    "slow-flights": {
+        "*": StubProfile("uniform", 0.02, 0.01),
+        "flights": StubProfile("lognormal", 0.3, 0.8, error_rate=0.02),
+    },
+}
+
+
+def create_stub_app(delay: float = 0.0, profiles: dict = None) -> FastAPI:
+    """Each ``POST /api/<service>`` echoes the payload after a sampled delay.
+
+    ``profiles`` maps a service (or ``"*"``) to a ``StubProfile``; without
+    one every service waits a fixed ``delay``. Failures return a 503.
+    """
+    app = FastAPI()
+    profiles = profiles or {}
+    default = profiles.get("*", StubProfile("fixed", delay))
+
+    @app.post("/api/{service}")
+    async def stub(service: str, request: Request):
+        payload = await request.json()
+        profile = profiles.get(service, default)
+        wait = profile.sample()
+        if wait:
+            await asyncio.sleep(wait)
+        if profile.fails():
+            return JSONResponse({"error": f"stub {service} failure"}, status_code=503)
+        return {"service": service, "request": payload}
+
+    return app
+
+
+def stub_urls(port: int, host: str = "127.0.0.1") -> dict:
+    base = f"http://{host}:{port}/api"
+    return {
+        "Maps": f"{base}/maps",
+        "Flights": f"{base}/flights",
+        "Hotels": f"{base}/hotels",
+        "Transport": f"{base}/uber",
+    }
+
+
+def stub_env(port: int, host: str = "127.0.0.1") -> dict:
+    """Environment variables that point a trip server at the stubs."""
+    return {URL_ENV_VARS[service]: url for service, url in stub_urls(port, host).items()}
+
+
+@contextlib.contextmanager
+def running_stub_upstreams(port: int = 8765, delay: float = 0.0, host: str = "127.0.0.1", profiles: dict = None):
+    """Serve the stub upstreams on a background thread for the duration of the block."""
+    config = uvicorn.Config(create_stub_app(delay, profiles), host=host, port=port, log_level="warning", backlog=4096)
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    try:
+        yield stub_urls(port, host)
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub maps/flights/hotels/uber upstreams")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), help="named latency/error setup")
+    parser.add_argument("--latency", default="fixed", help="fixed, uniform, lognormal or exponential")
+    parser.add_argument("--mean", type=float, default=0.0, help="mean (median for lognormal) latency in seconds")
+    parser.add_argument("--spread", type=float, default=0.0, help="uniform half-width or lognormal sigma")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls answered with a 503")
+    args = parser.parse_args()
+
+    profiles = SCENARIOS[args.scenario] if args.scenario else {
+        "*": StubProfile(args.latency, args.mean, args.spread, args.error_rate)
+    }
+    uvicorn.run(create_stub_app(profiles=profiles), host=args.host, port=args.port, log_level="warning",
+                backlog=4096)
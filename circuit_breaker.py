@@ -0,0 +1,129 @@
+import logging
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker driven by the recent failure rate.
+
+    A call counts as failed if it errored or took longer than
+    ``slow_call_threshold`` seconds. Once at least ``min_calls`` outcomes are
+    in the window and the failure rate reaches ``failure_rate_threshold`` the
+    breaker opens and rejects calls for ``open_duration`` seconds, then lets
+    ``half_open_max_calls`` probes through: a successful probe closes it, a
+    failed one opens it again.
+    """
+
+    def __init__(self, name: str, window: int = 20, min_calls: int = 10, failure_rate_threshold: float = 0.5,
+                 slow_call_threshold: float = None, open_duration: float = 30.0, half_open_max_calls: int = 1):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_threshold = slow_call_threshold
+        self.open_duration = open_duration
+        self.half_open_max_calls = half_open_max_calls
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probes = 0
+        self.rejected = 0
+        self.opened = 0
+
+    def _transition(self, state: str):
+        if state != self.state:
+            logger.warning(f"Circuit breaker for {self.name}: {self.state} -> {state}")
+        self.state = state
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+            self.opened += 1
+        elif state == HALF_OPEN:
+            self._probes = 0
+        elif state == CLOSED:
+            self._outcomes.clear()
+
+    def allow(self) -> bool:
+        """Return whether a call may go ahead; rejected calls should fail fast."""
+        if self.state == OPEN and time.monotonic() - self._opened_at >= self.open_duration:
+            self._transition(HALF_OPEN)
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and self._probes < self.half_open_max_calls:
+            self._probes += 1
+            return True
+        self.rejected += 1
+        return False
+
+    def release_probe(self):
+        """Give back a call allowed through that ended without an outcome (e.g. cancelled)."""
+        if self.state == HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+    def record(self, success: bool, latency: float):
+        failed = not success or (self.slow_call_threshold is not None and latency > self.slow_call_threshold)
+        if self.state == HALF_OPEN:
+            self._transition(OPEN if failed else CLOSED)
+            return
+        if self.state == OPEN:
+            return
+        self._outcomes.append(failed)
+        if len(self._outcomes) >= self.min_calls and self.failure_rate() >= self.failure_rate_threshold:
+            self._transition(OPEN)
+
+    def failure_rate(self) -> float:
+        return sum(self._outcomes) / len(self._outcomes) if self._outcomes else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "failure_rate": round(self.failure_rate(), 3),
+            "window_calls": len(self._outcomes),
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
+
+
+class AdaptiveLimiter:
+    """AIMD limit on in-flight calls to one upstream.
+
+    Each fast success raises the limit by ``1 / limit`` (about +1 per
+    window of calls); each failure or call slower than ``latency_target``
+    halves it. Calls over the limit are rejected immediately rather than
+    queued, so a sick upstream cannot soak up worker capacity.
+    """
+
+    def __init__(self, initial_limit: int = 20, min_limit: int = 1, max_limit: int = 200,
+                 latency_target: float = None, backoff: float = 0.5):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.in_flight = 0
+        self.rejected = 0
+
+    def try_acquire(self) -> bool:
+        if self.in_flight >= int(self.limit):
+            self.rejected += 1
+            return False
+        self.in_flight += 1
+        return True
+
+    def abandon(self):
+        """Free the slot of a call that ended without an outcome, leaving the limit as is."""
+        self.in_flight -= 1
+
+    def release(self, success: bool, latency: float):
+        self.in_flight -= 1
+        if not success or (self.latency_target is not None and latency > self.latency_target):
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def stats(self) -> dict:
+        return {"limit": int(self.limit), "in_flight": self.in_flight, "rejected": self.rejected}
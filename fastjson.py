@@ -0,0 +1,31 @@
+"""JSON encode/decode through orjson when it is installed, the stdlib otherwise.
+
+orjson is several times faster on the large upstream payloads and writes
+compact output; ``pip install orjson`` to enable it.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+HAS_ORJSON = orjson is not None
+
+
+def dumps(value) -> bytes:
+    """Compact UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str).encode()
+
+
+def dumps_str(value) -> str:
+    return dumps(value).decode()
+
+
+def loads(data):
+    """Parse JSON from ``bytes`` or ``str``."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -0,0 +1,282 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _header(self) -> list:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, e.g. errors or tokens."""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> dict:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> list:
+        lines = self._header()
+        for key, value in sorted(self.samples().items()):
+            lines.append(f"{self.name}{_format_labels(dict(zip(self.labelnames, key)))} {_format_value(value)}")
+        return lines
+
+    def snapshot(self) -> dict:
+        return {"/".join(key) or "total": value for key, value in sorted(self.samples().items())}
+
+
+class Gauge(Counter):
+    """Value that goes up and down, e.g. calls in flight."""
+
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    @contextmanager
+    def track(self, **labels):
+        """Count the block as in flight while it runs."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets, Prometheus style."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total, count = self._values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the block in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> dict:
+        with self._lock:
+            return {key: (list(counts), total, count) for key, (counts, total, count) in self._values.items()}
+
+    def render(self) -> list:
+        lines = self._header()
+        for key, (counts, total, count) in sorted(self.samples().items()):
+            labels = dict(zip(self.labelnames, key))
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': bound})} {bucket_count}")
+            lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': '+Inf'})} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+    def snapshot(self) -> dict:
+        return {
+            "/".join(key) or "total": {"count": count, "avg_ms": round(total / count * 1000, 2) if count else None}
+            for key, (_, total, count) in sorted(self.samples().items())
+        }
+
+
+class Registry:
+    """A named set of metrics rendered together for ``/metrics``."""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: tuple = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: tuple = ()) -> Gauge:
+        return self._register(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict:
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+
+REGISTRY = Registry()
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Trip servers: one series per upstream service
+UPSTREAM_LATENCY = REGISTRY.histogram(
+    "upstream_request_seconds", "Upstream call latency, by service and outcome", ("service", "outcome"))
+UPSTREAM_IN_FLIGHT = REGISTRY.gauge("upstream_in_flight", "Upstream calls currently in flight", ("service",))
+UPSTREAM_ERRORS = REGISTRY.counter(
+    "upstream_errors_total", "Failed or rejected upstream calls, by service and reason", ("service", "reason"))
+
+# Trip servers: admission control in front of /plan-trip
+ADMISSION_IN_FLIGHT = REGISTRY.gauge("admission_in_flight", "Admitted trip requests currently running")
+ADMISSION_QUEUE_DEPTH = REGISTRY.gauge("admission_queue_depth", "Trip requests waiting for a slot", ("lane",))
+ADMISSION_SHED = REGISTRY.counter(
+    "admission_shed_total", "Trip requests rejected with a 503, by lane and reason", ("lane", "reason"))
+
+# MCP client: tool calls and model calls
+TOOL_CALL_LATENCY = REGISTRY.histogram(
+    "mcp_tool_call_seconds", "call_tool round trip, by tool and outcome", ("tool", "outcome"))
+MODEL_CALL_LATENCY = REGISTRY.histogram("model_call_seconds", "Model call latency, start to final message", ("model",))
+MODEL_FIRST_TOKEN = REGISTRY.histogram("model_first_token_seconds", "Time to the first streamed text", ("model",))
+MODEL_TOKENS = REGISTRY.counter("model_tokens_total", "Tokens used, by model and kind", ("model", "kind"))
+
+
+# Optional tracing: spans opened inside another span (also across
+# asyncio.gather, which copies the context) share its trace id
+TRACING_ENABLED = os.getenv("TRACING", "0") == "1"
+_current_span = contextvars.ContextVar("current_span", default=None)
+FINISHED_SPANS = deque(maxlen=2000)
+
+
+class Span:
+    def __init__(self, name: str, parent=None, **attributes):
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent is not None else None
+        self.attributes = attributes
+        self.start = time.time()
+        self.duration_ms = None
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+        }
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Record the block as a span when ``TRACING=1``; yields the span or None."""
+    if not TRACING_ENABLED:
+        yield None
+        return
+    current = Span(name, _current_span.get(), **attributes)
+    token = _current_span.set(current)
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.attributes["error"] = type(e).__name__
+        raise
+    finally:
+        current.duration_ms = round((time.perf_counter() - start) * 1000, 2)
+        _current_span.reset(token)
+        FINISHED_SPANS.append(current)
+
+
+def recent_traces(limit: int = 20) -> list:
+    """The last ``limit`` traces, each a root span with its children nested under it."""
+    spans = [s.to_dict() for s in list(FINISHED_SPANS)]
+    by_id = {s["span_id"]: {**s, "children": []} for s in spans}
+    roots = []
+    for s in by_id.values():
+        parent = by_id.get(s["parent_id"])
+        if parent is not None:
+            parent["children"].append(s)
+        elif s["parent_id"] is None:
+            roots.append(s)
+    return roots[-limit:]
+
+
+def start_periodic_dump(path: str, interval: float = 15.0, registry: Registry = REGISTRY) -> threading.Event:
+    """Write the registry to ``path`` every ``interval`` seconds from a daemon thread.
+
+    Returns an event; set it to stop dumping. The file is replaced atomically,
+    so it can be scraped by a node-exporter textfile collector or just read.
+    """
+    stop = threading.Event()
+
+    def dump():
+        while not stop.wait(interval):
+            try:
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, "w") as f:
+                    f.write(registry.render())
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.warning(f"Could not write metrics to {path}: {e}")
+
+    threading.Thread(target=dump, name="metrics-dump", daemon=True).start()
+    return stop
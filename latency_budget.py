@@ -0,0 +1,67 @@
+import asyncio
+import math
+from collections import deque
+
+
+class LatencyTracker:
+    """Sliding window of recent successful call latencies per service."""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples = {}
+
+    def record(self, service_name: str, seconds: float):
+        self._samples.setdefault(service_name, deque(maxlen=self.window)).append(seconds)
+
+    def count(self, service_name: str) -> int:
+        return len(self._samples.get(service_name, ()))
+
+    def percentile(self, service_name: str, q: float):
+        """Return the ``q`` quantile (0-1) of recent latencies, or None without samples."""
+        samples = sorted(self._samples.get(service_name, ()))
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, max(0, math.ceil(q * len(samples)) - 1))]
+
+    def stats(self) -> dict:
+        return {
+            service_name: {
+                "samples": len(samples),
+                "p50_ms": round(self.percentile(service_name, 0.50) * 1000, 1),
+                "p95_ms": round(self.percentile(service_name, 0.95) * 1000, 1),
+            }
+            for service_name, samples in self._samples.items() if samples
+        }
+
+
+def is_success(result) -> bool:
+    return not (isinstance(result, dict) and "error" in result)
+
+
+async def hedged(attempt, delay: float, on_hedge=None):
+    """Run ``attempt()``, starting a second copy if the first is slower than ``delay``.
+
+    The first successful result wins and the other attempt is cancelled. If
+    both fail, the result of whichever finished last is returned. ``on_hedge``
+    is called when the second attempt is fired.
+    """
+    first = asyncio.ensure_future(attempt())
+    done, _ = await asyncio.wait({first}, timeout=delay)
+    if done:
+        return first.result()
+
+    if on_hedge is not None:
+        on_hedge()
+    pending = {first, asyncio.ensure_future(attempt())}
+    result = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                result = task.result()
+                if is_success(result):
+                    return result
+        return result
+    finally:
+        for task in pending:
+            task.cancel()
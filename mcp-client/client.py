@@ -1,19 +1,32 @@
 import asyncio
+import hashlib
 import sys
 import logging
 import json
 import os
 import re
+import time
+from urllib.parse import urlparse
 os.makedirs("logs", exist_ok=True)
 
 from typing import Optional
 from contextlib import AsyncExitStack
 
-from mcp import ClientSession, StdioServerParameters
+from mcp import ClientSession, StdioServerParameters, types
 from mcp.client.stdio import stdio_client
 from mcp.client.sse import sse_client
+from mcp.shared.exceptions import McpError
 
-from anthropic import Anthropic
+# Shared helpers (e.g. the stdio session pool) live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mcp_session_pool import CONNECTION_ERRORS, StdioSessionPool
+from tool_result_cache import ToolResultCache
+from instrumentation import (MODEL_CALL_LATENCY, MODEL_FIRST_TOKEN, MODEL_TOKENS, REGISTRY, TOOL_CALL_LATENCY,
+                             start_periodic_dump)
+
+from history import ConversationHistory, estimate_tokens, with_prompt_caching
+
+from anthropic import AsyncAnthropic
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -30,10 +43,82 @@ logging.basicConfig(
 )
 
 class MCPClient:
-    def __init__(self):
+    def __init__(self, tools_ttl: Optional[float] = None, max_iterations: int = 10,
+                 time_budget: Optional[float] = None, max_concurrent_tools: int = 4,
+                 use_session_pool: bool = False, history: Optional[ConversationHistory] = None,
+                 tool_cache: Optional[ToolResultCache] = None):
         self.session = None
         self.exit_stack = AsyncExitStack()
-        self.anthropic = Anthropic()
+        self.anthropic = AsyncAnthropic()
+        self.last_timings = {}
+        self.last_usage = {}
+
+        # Keeps previous_messages within a token budget between queries
+        self.history = history or ConversationHistory()
+
+        # Memoized results for allowlisted tools; the scope keeps identically
+        # named tools on different servers apart when the cache is shared
+        self.tool_cache = tool_cache
+        self.tool_cache_scope = ""
+
+        # Limits for the tool-use loop in process_query: model turns per
+        # query, wall-clock seconds per query, and tools run at once
+        self.max_iterations = max_iterations
+        self.time_budget = time_budget
+        self.max_concurrent_tools = max_concurrent_tools
+
+        # With use_session_pool, stdio sessions are checked out of a
+        # process-wide warm pool and returned to it on cleanup
+        self.use_session_pool = use_session_pool
+        self._session_pool = None
+        self._pooled_session = None
+
+        # Converted tool catalog, cached per session. It is refreshed when the
+        # server sends tools/list_changed, or after tools_ttl seconds if set.
+        self.tools_ttl = tools_ttl
+        self._tools = None
+        self._tools_fetched_at = 0.0
+        self._tools_cache_hits = 0
+        self._tools_refreshes = 0
+
+    async def _handle_message(self, message):
+        """Invalidate the cached tool catalog when the server's tool list changes."""
+        notification = getattr(message, "root", message)
+        if isinstance(notification, types.ToolListChangedNotification):
+            logger.info("Server reported tools/list_changed, invalidating tool cache")
+            self.invalidate_tools()
+
+    def invalidate_tools(self):
+        self._tools = None
+
+    async def get_tools(self) -> list:
+        """Return the server's tools in Anthropic's schema, listing them only when needed."""
+        expired = self.tools_ttl is not None and time.monotonic() - self._tools_fetched_at > self.tools_ttl
+        if self._tools is not None and not expired:
+            self._tools_cache_hits += 1
+            return self._tools
+
+        response = await self.session.list_tools()
+        self._tools = [{
+            "name": tool.name,
+            "description": tool.description,
+            "input_schema": dict(tool.inputSchema) if tool.inputSchema else {}
+             } for tool in response.tools]
+        self._tools_fetched_at = time.monotonic()
+        self._tools_refreshes += 1
+        logger.debug(f"Refreshed tool cache: {[tool['name'] for tool in self._tools]}")
+        return self._tools
+
+    def tools_cache_info(self) -> dict:
+        """Current state of the tool catalog cache."""
+        return {
+            "cached": self._tools is not None,
+            "tools": len(self._tools) if self._tools is not None else 0,
+            "age_seconds": round(time.monotonic() - self._tools_fetched_at, 1) if self._tools is not None else None,
+            "ttl_seconds": self.tools_ttl,
+            "hits": self._tools_cache_hits,
+            "refreshes": self._tools_refreshes,
+        }
 
     async def connect_to_sse_server(self, server_url: str):
         """Connect to an SSE MCP server."""
@@ -42,16 +127,16 @@ class MCPClient:
         self._streams_context = sse_client(url=server_url)
         streams = await self._streams_context.__aenter__()
 
-        self._session_context = ClientSession(*streams)
+        self._session_context = ClientSession(*streams, message_handler=self._handle_message)
         self.session = await self._session_context.__aenter__()
 
         # Initialize
         await self.session.initialize()
         
-        # List available tools
-        response = await self.session.list_tools()
-        tools = response.tools
-        logger.info(f"Connected to SSE MCP Server at {server_url}. Available tools: {[tool.name for tool in tools]}")
+        # List available tools (and prime the tool cache)
+        self.invalidate_tools()
+        tools = await self.get_tools()
+        logger.info(f"Connected to SSE MCP Server at {server_url}. Available tools: {[tool['name'] for tool in tools]}")
 
     async def connect_to_stdio_server(self, server_script_path: str):
         """Connect to a stdio MCP server."""
@@ -67,8 +152,9 @@ class MCPClient:
             command = "npx"
         else:
             # It's a file path
-            is_python = server_script_path.endswith(".py")
-            is_javascript = server_script_path.endswith(".js")
+            # The script comes first; anything after it is passed to the server
+            is_python = args[0].endswith(".py")
+            is_javascript = args[0].endswith(".js")
             if not (is_python or is_javascript):
                 raise ValueError("Server script must be a .py, .js file or npm package.")
         
@@ -82,17 +168,26 @@ class MCPClient:
 
         logger.debug(f"Connecting to stdio MCP server with command: {command} and args: {args}")
 
-        # Start the server
-        stdio_transport = await self.exit_stack.enter_async_context(stdio_client(server_params))
-        self.stdio, self.writer = stdio_transport
-        self.session = await self.exit_stack.enter_async_context(ClientSession(self.stdio, self.writer))
+        if self.use_session_pool:
+            # Reuse an already running and initialized server if one is idle
+            self._session_pool = StdioSessionPool.shared(server_params)
+            self._pooled_session = await self._session_pool.checkout()
+            self._pooled_session.message_handler = self._handle_message
+            self.session = self._pooled_session.session
+        else:
+            # Start the server
+            stdio_transport = await self.exit_stack.enter_async_context(stdio_client(server_params))
+            self.stdio, self.writer = stdio_transport
+            self.session = await self.exit_stack.enter_async_context(
+                ClientSession(self.stdio, self.writer, message_handler=self._handle_message)
+            )
 
-        await self.session.initialize()
+            await self.session.initialize()
 
-        # List available tools
-        response = await self.session.list_tools()
-        tools = response.tools
-        logger.info(f"Connected to stdio MCP Server. Available tools: {[tool.name for tool in tools]}")
+        # List available tools (and prime the tool cache)
+        self.invalidate_tools()
+        tools = await self.get_tools()
+        logger.info(f"Connected to stdio MCP Server. Available tools: {[tool['name'] for tool in tools]}")
 
     async def connect_to_server(self, server_path_or_url: str):
         """Connect to an MCP server (either stdio or SSE)."""
@@ -106,16 +201,105 @@ class MCPClient:
             # It's a script path, connect to stdio server
             await self.connect_to_stdio_server(server_path_or_url)
 
-    async def process_query(self, query: str, previous_messages: list = None) -> tuple[str, list]:
-        """Process a query using the MCP server and available tools."""
+    async def stream_message(self, on_text=None, **kwargs):
+        """Stream one model call, passing text deltas to ``on_text`` as they arrive.
+
+        Returns the final message. The event loop stays free while waiting on
+        the model, so calls from several clients really run concurrently.
+        """
+        start = time.perf_counter()
+        first_token = None
+        async with self.anthropic.messages.stream(**kwargs) as stream:
+            async for text in stream.text_stream:
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                if on_text:
+                    on_text(text)
+            message = await stream.get_final_message()
+        model = kwargs.get("model")
+        usage = getattr(message, "usage", None)
+        if usage is not None:
+            for key in ("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens"):
+                tokens = getattr(usage, key, None) or 0
+                self.last_usage[key] = self.last_usage.get(key, 0) + tokens
+                MODEL_TOKENS.inc(tokens, model=model, kind=key)
+        total = time.perf_counter() - start
+        MODEL_CALL_LATENCY.observe(total, model=model)
+        if first_token is not None:
+            MODEL_FIRST_TOKEN.observe(first_token, model=model)
+        first_token_ms = f"{first_token * 1000:.0f} ms" if first_token is not None else "n/a"
+        logger.info(f"{kwargs.get('model')} responded in {total * 1000:.0f} ms (first token {first_token_ms})")
+        return message
+
+    def is_connected(self) -> bool:
+        return self.session is not None
+
+    async def call_tool(self, tool_name: str, tool_args: dict):
+        """Execute one tool call on the connected session, through the result cache if set."""
+        start = time.perf_counter()
+        outcome = "exception"
+        try:
+            if self.tool_cache is None:
+                result = await self.session.call_tool(tool_name, tool_args)
+            else:
+                result = await self.tool_cache.call(
+                    tool_name, tool_args, lambda: self.session.call_tool(tool_name, tool_args),
+                    scope=self.tool_cache_scope
+                )
+            outcome = "error" if getattr(result, "isError", False) else "ok"
+            return result
+        finally:
+            TOOL_CALL_LATENCY.observe(time.perf_counter() - start, tool=tool_name, outcome=outcome)
+
+    async def _run_tool(self, content, semaphore: asyncio.Semaphore, timeout: Optional[float]) -> dict:
+        """Run a tool_use block and turn the outcome into a tool_result block."""
+        async with semaphore:
+            logger.debug(f"Calling tool {content.name} with args {content.input}...")
+            try:
+                result = await asyncio.wait_for(self.call_tool(content.name, content.input), timeout)
+            except asyncio.TimeoutError:
+                logger.error(f"Tool {content.name} ran out of time budget")
+                return {"type": "tool_result", "tool_use_id": content.id,
+                        "content": f"Tool {content.name} timed out", "is_error": True}
+            except Exception as e:
+                logger.error(f"Tool {content.name} failed: {e}")
+                return {"type": "tool_result", "tool_use_id": content.id,
+                        "content": f"Tool {content.name} failed: {e}", "is_error": True}
+        return {
+            "type": "tool_result",
+            "tool_use_id": content.id,
+            "content": result.content,
+            "is_error": bool(getattr(result, "isError", False)),
+        }
+
+    async def process_query(self, query: str, previous_messages: list = None, on_text=None) -> tuple[str, list]:
+        """Process a query using the MCP server and available tools.
+
+        ``on_text`` receives response text as it streams in; timings for the
+        query end up in ``self.last_timings``.
+        """
         model = "claude-3-5-sonnet-20241022"
-
-        if not self.session:
+        query_start = time.perf_counter()
+        model_calls = 0
+        self.last_usage = {}
+        first_output = None
+
+        def emit(text):
+            nonlocal first_output
+            if first_output is None:
+                first_output = time.perf_counter() - query_start
+            if on_text:
+                on_text(text)
+
+        if not self.is_connected():
             raise RuntimeError("Client session is not initialized.")
         
+        # Old turns are compacted (large tool results digested, oldest
+        # exchanges summarized) so each query does not resend everything
         messages = []
         if previous_messages:
-            messages.extend(previous_messages)
+            messages.extend(self.history.compact(previous_messages))
+            self.last_usage["history_tokens_estimate"] = estimate_tokens(messages)
 
         messages.append( 
             {
@@ -124,69 +308,61 @@ class MCPClient:
             }
         )
         
-        response = await self.session.list_tools()
-        available_tools = [{
-            "name": tool.name,
-            "description": tool.description,
-            "input_schema": dict(tool.inputSchema) if tool.inputSchema else {}
-             } for tool in response.tools]
-
-        # Initialize Claude API call
-        logger.info(f"Sending query to {model}...")
-        response = self.anthropic.messages.create(
-            model=model,
-            messages=messages,
-            tools=available_tools,
-            max_tokens=1000
-        )
+        # Tools come first in the prompt and rarely change: cache them provider-side
+        available_tools, _ = with_prompt_caching(await self.get_tools())
 
-        # Process response and handle tool calls
+        # Agentic loop: run every tool_use in a turn concurrently, send all the
+        # results back in one message, and repeat until the model stops
+        # calling tools. The last allowed turn forbids tools so the model
+        # always finishes with a text answer.
         final_text = []
-        assistant_message_content = []
-
-        for content in response.content:
-            if content.type == 'text':
-                final_text.append(content.text)
-                assistant_message_content.append(content)
-            elif content.type == 'tool_use':
-                tool_name = content.name
-                tool_args = content.input
-
-                # Execute tool call
-                logger.debug(f"Calling tool {tool_name} with args {tool_args}...")
-                result = await self.session.call_tool(tool_name, tool_args)
-                final_text.append(f"[Calling tool {tool_name} with args {tool_args}]")
-                
-                assistant_message_content.append(content)
-                messages.append({
-                    "role": "assistant",
-                    "content": assistant_message_content
-                })
-                messages.append({
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "tool_result",
-                            "tool_use_id": content.id,
-                            "content": result.content
-                        }
-                    ]
-                })
-
-                # Get next response from Claude
-                next_response = self.anthropic.messages.create(
-                    model=model,
-                    messages=messages,
-                    tools=available_tools,
-                    max_tokens=1000
-                )
-            
-                final_text.append(next_response.content[0].text)
-                messages.append({
-                    "role": "assistant",
-                    "content": next_response.content[0].text
-                })
+        semaphore = asyncio.Semaphore(self.max_concurrent_tools)
+        for iteration in range(self.max_iterations):
+            elapsed = time.perf_counter() - query_start
+            out_of_budget = self.time_budget is not None and elapsed >= self.time_budget
+            last_turn = iteration == self.max_iterations - 1 or out_of_budget
+            if out_of_budget:
+                logger.warning(f"Time budget of {self.time_budget}s used up, asking {model} to finish")
+
+            logger.info(f"Sending query to {model} (turn {iteration + 1})...")
+            response = await self.stream_message(
+                on_text=emit,
+                model=model,
+                messages=messages,
+                tools=available_tools,
+                tool_choice={"type": "none"} if last_turn else {"type": "auto"},
+                max_tokens=1000
+            )
+            model_calls += 1
+            messages.append({
+                "role": "assistant",
+                "content": response.content
+            })
+
+            final_text.extend(content.text for content in response.content if content.type == 'text')
+            tool_uses = [content for content in response.content if content.type == 'tool_use']
+            if not tool_uses:
+                break
 
+            for content in tool_uses:
+                final_text.append(f"[Calling tool {content.name} with args {content.input}]")
+                emit(f"\n[Calling tool {content.name} with args {content.input}]\n")
+            remaining = None
+            if self.time_budget is not None:
+                remaining = max(0.0, self.time_budget - (time.perf_counter() - query_start))
+            tool_results = await asyncio.gather(*(
+                self._run_tool(content, semaphore, remaining) for content in tool_uses
+            ))
+            messages.append({
+                "role": "user",
+                "content": list(tool_results)
+            })
+
+        self.last_timings = {
+            "first_output_ms": round(first_output * 1000) if first_output is not None else None,
+            "total_ms": round((time.perf_counter() - query_start) * 1000),
+            "model_calls": model_calls,
+        }
         return "\n".join(final_text), messages
     
     async def chat_loop(self):
@@ -203,14 +379,35 @@ class MCPClient:
                 #  Check if the user wants to refresh conversation (history)
                 if query.lower() == "refresh":
                     previous_messages = []
+
+                if query.lower() == "tools":
+                    print("\nTool cache:", json.dumps(self.tools_cache_info()))
+                    if self.tool_cache is not None:
+                        print("Tool result cache:", json.dumps(self.tool_cache.stats()))
+                    continue
+
+                if query.lower() == "metrics":
+                    print("\nMetrics:", json.dumps(REGISTRY.snapshot(), indent=2))
+                    continue
             
-                response, previous_messages = await self.process_query(query, previous_messages=previous_messages)
-                print("\nResponse:", response)
+                print("\nResponse: ", end="", flush=True)
+                response, previous_messages = await self.process_query(
+                    query, previous_messages=previous_messages, on_text=lambda text: print(text, end="", flush=True)
+                )
+                print(f"\n[first token {self.last_timings['first_output_ms']} ms, "
+                      f"total {self.last_timings['total_ms']} ms, "
+                      f"tokens in {self.last_usage.get('input_tokens', 0)} "
+                      f"(cache read {self.last_usage.get('cache_read_input_tokens', 0)}, "
+                      f"cache write {self.last_usage.get('cache_creation_input_tokens', 0)}) "
+                      f"out {self.last_usage.get('output_tokens', 0)}]")
             except Exception as e:
                 print("Error:", str(e))
 
-    async def clenup(self):
-        """Clean up resources."""
+    async def clenup(self, discard_session: bool = False):
+        """Clean up resources. A pooled session goes back to its pool unless discarded."""
+        if self._pooled_session is not None:
+            pooled, self._pooled_session = self._pooled_session, None
+            await self._session_pool.release(pooled, discard=discard_session)
         await self.exit_stack.aclose()
         if hasattr(self, '_session_context') and self._session_context:
             await self._session_context.__aexit__(None, None, None)
@@ -218,6 +415,158 @@ class MCPClient:
             await self._streams_context.__aexit__(None, None, None)
 
 
+TOOL_NAME_SEPARATOR = "__"
+# Longest tool name the Messages API accepts
+MAX_TOOL_NAME_LENGTH = 64
+
+
+def exposed_tool_name(server: str, tool: str) -> str:
+    """``<server>__<tool>``, shortened with a hash suffix when over the API's length limit."""
+    name = f"{server}{TOOL_NAME_SEPARATOR}{tool}"
+    if len(name) <= MAX_TOOL_NAME_LENGTH:
+        return name
+    digest = hashlib.sha1(name.encode()).hexdigest()[:8]
+    return f"{name[:MAX_TOOL_NAME_LENGTH - len(digest) - 1]}_{digest}"
+
+
+GENERIC_SERVER_NAMES = {"", ".", "server", "mcp", "index", "main", "src"}
+
+
+def server_name_for(server_path_or_url: str) -> str:
+    """Short identifier for a server, e.g. "@openbnb/mcp-server-airbnb --flag" -> "airbnb"."""
+    target = server_path_or_url.split(" ")[0].rstrip("/")
+    if re.match(r'^https?://', target):
+        candidates = [urlparse(target).hostname or ""]
+    else:
+        # Last path component first; "@scope/pkg@version" -> "pkg", "scope"
+        candidates = [os.path.splitext(part.lstrip("@").split("@")[0])[0] for part in reversed(target.split("/"))]
+    for candidate in candidates:
+        name = candidate
+        for affix in ("mcp-server-", "mcp_server_", "-mcp", "_mcp", "mcp-", "mcp_"):
+            name = name.replace(affix, "")
+        if name not in GENERIC_SERVER_NAMES:
+            break
+    else:
+        name = "server"
+    return re.sub(r"[^a-zA-Z0-9_-]", "_", name)[:20]
+
+
+class MCPRouter(MCPClient):
+    """One conversation over several MCP servers.
+
+    Each server keeps its own session (an ``MCPClient``), but the model sees
+    a single merged tool catalog with names namespaced as
+    ``<server>__<tool>`` (hash-shortened past 64 characters), and every
+    tool_use is routed to the session that owns it. A session whose
+    transport has died is reconnected and the call retried once.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._client_kwargs = {
+            "tools_ttl": kwargs.get("tools_ttl"),
+            "use_session_pool": kwargs.get("use_session_pool", False),
+            "tool_cache": kwargs.get("tool_cache"),
+        }
+        self.servers = {}
+        self.clients = {}
+        # Exposed (namespaced) tool name -> (server name, original tool name)
+        self._tool_routes = {}
+        self._reconnect_locks = {}
+        self.reconnects = {}
+
+    async def add_server(self, server_path_or_url: str, name: Optional[str] = None) -> str:
+        """Connect to a server and add its tools to the merged catalog."""
+        name = name or server_name_for(server_path_or_url)
+        base, suffix = name, 2
+        while name in self.servers:
+            name, suffix = f"{base}{suffix}", suffix + 1
+        self.servers[name] = server_path_or_url
+        self._reconnect_locks[name] = asyncio.Lock()
+        self.reconnects[name] = 0
+
+        client = MCPClient(**self._client_kwargs)
+        client.tool_cache_scope = name
+        await client.connect_to_server(server_path_or_url)
+        self.clients[name] = client
+        self.invalidate_tools()
+        logger.info(f"Router added server '{name}' ({server_path_or_url})")
+        return name
+
+    async def reconnect(self, name: str):
+        """Replace the session for ``name`` with a fresh connection."""
+        async with self._reconnect_locks[name]:
+            old_client = self.clients.pop(name, None)
+            if old_client is not None:
+                try:
+                    await old_client.clenup(discard_session=True)
+                except Exception as e:
+                    logger.debug(f"Ignoring error while closing dead session '{name}': {e}")
+            client = MCPClient(**self._client_kwargs)
+            client.tool_cache_scope = name
+            await client.connect_to_server(self.servers[name])
+            self.clients[name] = client
+            self.reconnects[name] += 1
+            self.invalidate_tools()
+            logger.info(f"Reconnected to server '{name}'")
+
+    def is_connected(self) -> bool:
+        return bool(self.clients)
+
+    def invalidate_tools(self):
+        super().invalidate_tools()
+        for client in getattr(self, "clients", {}).values():
+            client.invalidate_tools()
+
+    async def get_tools(self) -> list:
+        """Merged catalog of every server's tools, names prefixed with the server name."""
+        tools = []
+        for name, client in list(self.clients.items()):
+            for tool in await client.get_tools():
+                exposed = exposed_tool_name(name, tool["name"])
+                self._tool_routes[exposed] = (name, tool["name"])
+                tools.append({
+                    **tool,
+                    "name": exposed,
+                    "description": f"[{name}] {tool['description'] or ''}",
+                })
+        self._tools = tools
+        return tools
+
+    async def call_tool(self, tool_name: str, tool_args: dict):
+        """Route a namespaced tool call to the session that owns the tool."""
+        if tool_name not in self._tool_routes:
+            await self.get_tools()
+        if tool_name not in self._tool_routes:
+            raise ValueError(f"Unknown tool {tool_name}")
+        name, original_name = self._tool_routes[tool_name]
+        if name not in self.clients:
+            await self.reconnect(name)
+        client = self.clients[name]
+        try:
+            return await client.call_tool(original_name, tool_args)
+        except (McpError, *CONNECTION_ERRORS) as e:
+            if isinstance(e, McpError) and getattr(e.error, "code", None) != getattr(types, "CONNECTION_CLOSED", -32000):
+                raise
+            logger.warning(f"Session '{name}' lost ({e!r}), reconnecting")
+            if self.clients.get(name) is client:
+                await self.reconnect(name)
+            return await self.clients[name].call_tool(original_name, tool_args)
+
+    def tools_cache_info(self) -> dict:
+        return {name: client.tools_cache_info() for name, client in self.clients.items()}
+
+    async def clenup(self, discard_session: bool = False):
+        """Close every server session."""
+        for name, client in list(self.clients.items()):
+            try:
+                await client.clenup(discard_session=discard_session)
+            except Exception as e:
+                logger.error(f"Error closing session '{name}': {e}")
+        self.clients.clear()
+        await super().clenup()
+
+
 async def main():
     if len(sys.argv) < 2:
         print("Usage: python client.py <server_script_path_or_url>")
@@ -247,55 +596,27 @@ if __name__ == "__main__":
             print("  - SSE MCP server: python client.py http://localhost:3000/mcp")
             sys.exit(1)
 
-        # Create an MCPClient instance for each server and connect concurrently
-        clients = [MCPClient() for _ in servers]
-        await asyncio.gather(*(client.connect_to_server(server) for client, server in zip(clients, servers)))
-        for server in servers:
-            print(f"Connected to {server}")
-
-        # Maintain separate conversation histories per client
-        previous_messages = {client: [] for client in clients}
-
-        print("Type your queries or 'quit' to exit.")
-        while True:
-            query = input("\nQuery: ").strip()
-            if query.lower() == "quit":
-                break
-            if query.lower() == "refresh":
-                for client in clients:
-                    previous_messages[client] = []
-                continue
-
-            # Process the query on each server concurrently
-            results = await asyncio.gather(*[
-                client.process_query(query, previous_messages=previous_messages[client])
-                for client in clients
-            ])
-
-            # Update conversation histories and store server responses
-            aggregated_context = ""
-            for i, (response_text, updated_messages) in enumerate(results):
-                previous_messages[clients[i]] = updated_messages
-                aggregated_context += f"Response from server {i+1}:\n{response_text}\n\n"
-
-            # Ask Claude to produce a final aggregated output using all responses as context.
-            final_prompt = (
-                "Combine the following responses into a final, coherent answer:\n"
-                f"{aggregated_context}"
-            )
-            final_response = clients[0].anthropic.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                messages=[{
-                    "role": "user",
-                    "content": final_prompt
-                }],
-                max_tokens=1000
-            )
-
-            print("\nFinal Combined Response:", final_response.content[0].text)
-
-        # Cleanup all clients concurrently
-        await asyncio.gather(*(client.clenup() for client in clients))
-        print("\nMCP Clients Closed!")
+        # One conversation over all servers: the router merges their tools
+        # and sends each tool call to the right session
+        # Listing searches are slow and rate limited; identical ones within the
+        # TTL are answered from the cache, which also persists across restarts
+        tool_cache = ToolResultCache(
+            {"airbnb_search": 600, "airbnb_listing_details": 3600},
+            disk_path="logs/tool_results.sqlite3",
+        )
+        router = MCPRouter(tool_cache=tool_cache)
+        # Tool and model latency/token metrics, rewritten in Prometheus format
+        # every MCP_METRICS_INTERVAL seconds (0 turns it off)
+        metrics_interval = float(os.getenv("MCP_METRICS_INTERVAL", "15"))
+        if metrics_interval > 0:
+            start_periodic_dump("logs/metrics.prom", metrics_interval)
+        try:
+            names = await asyncio.gather(*(router.add_server(server) for server in servers))
+            for server, name in zip(servers, names):
+                print(f"Connected to {server} as '{name}'")
+            await router.chat_loop()
+        finally:
+            await router.clenup()
+            print("\nMCP Clients Closed!")
 
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,149 @@
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Rough but dependency-free token estimate, good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+
+def _to_jsonable(value):
+    if hasattr(value, "model_dump"):
+        return value.model_dump(exclude_none=True)
+    if isinstance(value, dict):
+        return {k: _to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_jsonable(v) for v in value]
+    return value
+
+
+def _block_type(block):
+    return block.get("type") if isinstance(block, dict) else getattr(block, "type", None)
+
+
+def estimate_tokens(value) -> int:
+    if isinstance(value, str):
+        return len(value) // CHARS_PER_TOKEN + 1
+    return len(json.dumps(_to_jsonable(value), default=str)) // CHARS_PER_TOKEN + 1
+
+
+def _text_of(content) -> str:
+    """Plain text of a message's content, ignoring tool blocks."""
+    if isinstance(content, str):
+        return content
+    parts = []
+    for block in content:
+        if _block_type(block) == "text":
+            parts.append(block["text"] if isinstance(block, dict) else block.text)
+    return " ".join(parts)
+
+
+def _is_user_query(message: dict) -> bool:
+    """A user message that starts a new exchange (not a batch of tool results)."""
+    if message["role"] != "user":
+        return False
+    content = message["content"]
+    return isinstance(content, str) or all(_block_type(block) != "tool_result" for block in content)
+
+
+class ConversationHistory:
+    """Keeps conversation history within a token budget.
+
+    Two steps, cheapest first:
+
+    1. ``tool_result`` payloads from earlier exchanges that are larger than
+       ``max_tool_result_chars`` are swapped for a short digest (size plus
+       a preview). The model has already read them.
+    2. If the history is still over ``token_budget``, whole exchanges are
+       dropped from the front and replaced with an extractive summary of
+       what was asked and answered.
+
+    The most recent ``keep_recent`` exchanges are never touched.
+    """
+
+    def __init__(self, token_budget: int = 20000, keep_recent: int = 2, max_tool_result_chars: int = 1000,
+                 preview_chars: int = 200, summary_chars: int = 1500):
+        self.token_budget = token_budget
+        self.keep_recent = max(1, keep_recent)
+        self.max_tool_result_chars = max_tool_result_chars
+        self.preview_chars = preview_chars
+        self.summary_chars = summary_chars
+        self.digested = 0
+        self.dropped_exchanges = 0
+
+    def _exchanges(self, messages: list) -> list:
+        """Split messages into exchanges, each starting at a user query."""
+        exchanges = []
+        for message in messages:
+            if _is_user_query(message) or not exchanges:
+                exchanges.append([])
+            exchanges[-1].append(message)
+        return exchanges
+
+    def _digest_tool_results(self, message: dict) -> dict:
+        if message["role"] != "user" or isinstance(message["content"], str):
+            return message
+        blocks = []
+        for block in message["content"]:
+            if _block_type(block) == "tool_result" and isinstance(block, dict):
+                raw = json.dumps(_to_jsonable(block.get("content")), default=str)
+                if len(raw) > self.max_tool_result_chars:
+                    block = {
+                        **block,
+                        "content": f"[Earlier tool result, {len(raw)} chars, compacted. "
+                                   f"Preview: {raw[:self.preview_chars]}...]",
+                    }
+                    self.digested += 1
+            blocks.append(block)
+        return {**message, "content": blocks}
+
+    def _summarize(self, exchanges: list) -> str:
+        lines = []
+        for exchange in exchanges:
+            for message in exchange:
+                text = _text_of(message["content"]).strip()
+                if text:
+                    speaker = "User" if message["role"] == "user" else "Assistant"
+                    lines.append(f"{speaker}: {text[:300]}")
+        return "\n".join(lines)[-self.summary_chars:]
+
+    def compact(self, messages: list) -> list:
+        """Return a copy of ``messages`` that fits the token budget."""
+        exchanges = self._exchanges(list(messages))
+        if len(exchanges) <= self.keep_recent:
+            return list(messages)
+
+        older, recent = exchanges[:-self.keep_recent], exchanges[-self.keep_recent:]
+        older = [[self._digest_tool_results(message) for message in exchange] for exchange in older]
+
+        dropped = []
+        while older and estimate_tokens(older + recent) > self.token_budget:
+            dropped.append(older.pop(0))
+        self.dropped_exchanges += len(dropped)
+
+        kept = [message for exchange in older + recent for message in exchange]
+        if dropped:
+            # Fold the summary into the first kept user query so roles still alternate
+            summary = f"[Summary of earlier conversation]\n{self._summarize(dropped)}"
+            first = kept[0]
+            content = first["content"]
+            content = [{"type": "text", "text": content}] if isinstance(content, str) else list(content)
+            kept[0] = {**first, "content": [{"type": "text", "text": summary}] + content}
+            logger.info(f"Compacted history: dropped {len(dropped)} exchanges into a summary")
+        return kept
+
+    def stats(self) -> dict:
+        return {"digested_tool_results": self.digested, "dropped_exchanges": self.dropped_exchanges}
+
+
+def with_prompt_caching(tools: list, system=None):
+    """Mark the stable prefix (tools, then system prompt) for provider-side prompt caching.
+
+    Returns new ``(tools, system)`` values; the inputs are not modified.
+    """
+    cache_control = {"type": "ephemeral"}
+    if tools:
+        tools = tools[:-1] + [{**tools[-1], "cache_control": cache_control}]
+    if isinstance(system, str) and system:
+        system = [{"type": "text", "text": system, "cache_control": cache_control}]
+    return tools, system
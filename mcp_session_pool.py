@@ -0,0 +1,217 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+
+import anyio
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from mcp.shared.exceptions import McpError
+
+logger = logging.getLogger(__name__)
+
+# Errors that mean the transport to a server is gone rather than a tool failing
+CONNECTION_ERRORS = (anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream, ConnectionError)
+
+
+class PooledSession:
+    """An initialized MCP session over one stdio server process."""
+
+    def __init__(self, session: ClientSession, keeper: asyncio.Task, closing: asyncio.Event, spawn_seconds: float):
+        self.session = session
+        self.spawn_seconds = spawn_seconds
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.uses = 0
+        # Set by whoever has the session checked out to receive server notifications
+        self.message_handler = None
+        self._keeper = keeper
+        self._closing = closing
+
+    @property
+    def alive(self) -> bool:
+        return not self._keeper.done()
+
+    async def close(self):
+        self._closing.set()
+        try:
+            await asyncio.wait_for(self._keeper, timeout=5)
+        except Exception as e:
+            logger.debug(f"Error while closing pooled MCP session: {e}")
+
+
+class StdioSessionPool:
+    """Warm, pre-initialized stdio MCP sessions with checkout/return semantics.
+
+    Spawning a stdio server costs an interpreter start plus the
+    ``initialize`` handshake; the pool pays it once per process and hands
+    the session out again on the next checkout. Sessions idle longer than
+    ``health_check_after`` are pinged before reuse, sessions idle longer
+    than ``max_idle`` are closed, and at most ``max_size`` processes exist
+    at a time.
+    """
+
+    _shared = {}
+
+    def __init__(self, server_params: StdioServerParameters, max_size: int = 4, max_idle: float = 300.0,
+                 health_check_after: float = 30.0, health_check_timeout: float = 5.0):
+        self.server_params = server_params
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.health_check_after = health_check_after
+        self.health_check_timeout = health_check_timeout
+        self._idle = []
+        self._slots = asyncio.Semaphore(max_size)
+        self._reaper = None
+        self._stats = {
+            "spawned": 0, "reused": 0, "evicted": 0, "health_check_failures": 0,
+            "spawn_seconds": 0.0, "reuse_seconds": 0.0,
+        }
+
+    @classmethod
+    def shared(cls, server_params: StdioServerParameters, **kwargs) -> "StdioSessionPool":
+        """Process-wide pool for ``server_params``, created on first use."""
+        key = (server_params.command, tuple(server_params.args), tuple(sorted((server_params.env or {}).items())))
+        if key not in cls._shared:
+            cls._shared[key] = cls(server_params, **kwargs)
+        return cls._shared[key]
+
+    async def _spawn(self) -> PooledSession:
+        start = time.perf_counter()
+        ready = asyncio.get_running_loop().create_future()
+        closing = asyncio.Event()
+        holder = {}
+
+        async def message_handler(message):
+            pooled = holder.get("pooled")
+            if pooled is not None and pooled.message_handler is not None:
+                await pooled.message_handler(message)
+
+        # stdio_client and ClientSession must be entered and exited in the same
+        # task, so each session lives in its own keeper task until closed
+        async def keeper():
+            try:
+                async with stdio_client(self.server_params) as (read, write):
+                    async with ClientSession(read, write, message_handler=message_handler) as session:
+                        await session.initialize()
+                        ready.set_result(session)
+                        await closing.wait()
+            except Exception as e:
+                if not ready.done():
+                    ready.set_exception(e)
+                else:
+                    logger.warning(f"Pooled MCP server {self.server_params.command} exited: {e}")
+
+        task = asyncio.create_task(keeper())
+        session = await ready
+        spawn_seconds = time.perf_counter() - start
+        pooled = holder["pooled"] = PooledSession(session, task, closing, spawn_seconds)
+        self._stats["spawned"] += 1
+        self._stats["spawn_seconds"] += spawn_seconds
+        logger.info(f"Spawned MCP server {self.server_params.command} {' '.join(self.server_params.args)} "
+                    f"in {spawn_seconds * 1000:.0f} ms")
+        return pooled
+
+    async def _healthy(self, pooled: PooledSession) -> bool:
+        if not pooled.alive:
+            return False
+        if time.monotonic() - pooled.last_used < self.health_check_after:
+            return True
+        try:
+            await asyncio.wait_for(pooled.session.send_ping(), self.health_check_timeout)
+            return True
+        except Exception as e:
+            logger.warning(f"Pooled MCP session failed health check: {e}")
+            return False
+
+    async def _evict_idle(self):
+        now = time.monotonic()
+        expired = [pooled for pooled in self._idle if now - pooled.last_used > self.max_idle or not pooled.alive]
+        for pooled in expired:
+            self._idle.remove(pooled)
+            self._stats["evicted"] += 1
+            await pooled.close()
+
+    async def checkout(self) -> PooledSession:
+        """Take an idle healthy session, or spawn one if none is available."""
+        await self._slots.acquire()
+        start = time.perf_counter()
+        try:
+            await self._evict_idle()
+            while self._idle:
+                pooled = self._idle.pop()
+                if await self._healthy(pooled):
+                    self._stats["reused"] += 1
+                    self._stats["reuse_seconds"] += time.perf_counter() - start
+                    pooled.uses += 1
+                    return pooled
+                self._stats["health_check_failures"] += 1
+                await pooled.close()
+            pooled = await self._spawn()
+            pooled.uses += 1
+            return pooled
+        except BaseException:
+            self._slots.release()
+            raise
+
+    async def release(self, pooled: PooledSession, discard: bool = False):
+        """Return a session to the pool; ``discard`` closes it instead (e.g. after an error)."""
+        pooled.message_handler = None
+        pooled.last_used = time.monotonic()
+        try:
+            if discard or not pooled.alive:
+                await pooled.close()
+            else:
+                self._idle.append(pooled)
+        finally:
+            self._slots.release()
+
+    @asynccontextmanager
+    async def session(self):
+        """``async with pool.session() as session:`` checkout/return helper.
+
+        The session goes back to the pool unless the body failed with a
+        transport or protocol error; ordinary tool or validation errors
+        leave it usable.
+        """
+        pooled = await self.checkout()
+        discard = False
+        try:
+            yield pooled.session
+        except (McpError, *CONNECTION_ERRORS):
+            discard = True
+            raise
+        finally:
+            await self.release(pooled, discard=discard)
+
+    async def prewarm(self, count: int = 1):
+        """Spawn ``count`` sessions up front so the first requests skip the spawn."""
+        sessions = await asyncio.gather(*(self.checkout() for _ in range(min(count, self.max_size))))
+        for pooled in sessions:
+            await self.release(pooled)
+
+    def start_reaper(self, interval: float = None):
+        """Periodically close sessions idle for longer than ``max_idle``."""
+        async def reap():
+            while True:
+                await asyncio.sleep(interval or self.max_idle / 2)
+                await self._evict_idle()
+
+        if self._reaper is None:
+            self._reaper = asyncio.create_task(reap())
+
+    def stats(self) -> dict:
+        stats = dict(self._stats)
+        spawn_seconds, reuse_seconds = stats.pop("spawn_seconds"), stats.pop("reuse_seconds")
+        stats["idle"] = len(self._idle)
+        stats["avg_spawn_ms"] = round(spawn_seconds / stats["spawned"] * 1000, 1) if stats["spawned"] else None
+        stats["avg_reuse_ms"] = round(reuse_seconds / stats["reused"] * 1000, 2) if stats["reused"] else None
+        return stats
+
+    async def aclose(self):
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        idle, self._idle = self._idle, []
+        for pooled in idle:
+            await pooled.close()
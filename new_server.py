@@ -3,42 +3,218 @@ import os
 import json
 from datetime import datetime, timedelta
 import anthropic
+import argparse
+import asyncio
+import logging
 import subprocess
 import sys
 import shutil
+import threading
+import time
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+logger = logging.getLogger("flight-server")
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 
 # Initialize Claude client
 client = anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
 
-def run_server():
-    print("Starting MCP Flight Search server...")
-    
+# Restart backoff: doubles after every crash up to the max, and resets once
+# the server has stayed up for HEALTHY_AFTER seconds
+INITIAL_BACKOFF = 1.0
+MAX_BACKOFF = 30.0
+HEALTHY_AFTER = 60.0
+# How often the SSE bridge pings the stdio server to notice a dead process
+PING_INTERVAL = 15.0
+
+
+def find_flight_search():
     # Find the mcp-flights-search executable
     mcp_flights_search = shutil.which("mcp-flight-search")
     if not mcp_flights_search:
         print("Error: mcp-flights-search command not found. Please make sure it's installed:")
         print("pip install mcp-flights-search")
         sys.exit(1)
-    
+    return mcp_flights_search
+
+
+class Supervisor:
+    """Keep ``run_once`` running, restarting it with exponential backoff when it exits."""
+
+    def __init__(self, name: str, run_once):
+        self.name = name
+        self.run_once = run_once
+        self.restarts = 0
+
+    async def run(self):
+        backoff = INITIAL_BACKOFF
+        while True:
+            started = time.monotonic()
+            try:
+                await self.run_once()
+                logger.warning(f"{self.name} exited")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"{self.name} crashed: {e}")
+            if time.monotonic() - started >= HEALTHY_AFTER:
+                backoff = INITIAL_BACKOFF
+            logger.info(f"Restarting {self.name} in {backoff:.1f}s")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, MAX_BACKOFF)
+            self.restarts += 1
+
+
+async def drain(stream, label: str):
+    """Log a subprocess pipe line by line so it can never fill up and block the child."""
+    while True:
+        line = await stream.readline()
+        if not line:
+            return
+        logger.info(f"[{label}] {line.decode(errors='replace').rstrip()}")
+
+
+def drain_fd_in_thread(fd: int, label: str):
+    """Same as ``drain`` for a raw pipe fd handed to a child we do not spawn ourselves."""
+    def pump():
+        with os.fdopen(fd, "r", errors="replace") as pipe:
+            for line in pipe:
+                logger.info(f"[{label}] {line.rstrip()}")
+
+    threading.Thread(target=pump, name=f"drain-{label}", daemon=True).start()
+
+
+async def run_process_once(command: list, env: dict):
+    process = await asyncio.create_subprocess_exec(
+        *command,
+        env=env,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+    print(f"Server started successfully! (pid {process.pid})")
+    drains = [asyncio.create_task(drain(process.stdout, "stdout")), asyncio.create_task(drain(process.stderr, "stderr"))]
+    try:
+        code = await process.wait()
+        await asyncio.gather(*drains)
+        if code != 0:
+            raise RuntimeError(f"exit code {code}")
+    finally:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+
+
+class StdioBridge:
+    """One supervised stdio session to the flight server, shared by many SSE clients."""
+
+    def __init__(self, server_params: StdioServerParameters):
+        self.server_params = server_params
+        self.session = None
+        self._ready = asyncio.Event()
+        self.supervisor = Supervisor("mcp-flight-search (stdio bridge)", self._run_once)
+
+    async def _run_once(self):
+        read_fd, write_fd = os.pipe()
+        drain_fd_in_thread(read_fd, "stderr")
+        with os.fdopen(write_fd, "w") as errlog:
+            async with stdio_client(self.server_params, errlog=errlog) as (read, write):
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    self.session = session
+                    self._ready.set()
+                    logger.info("Stdio flight server ready for SSE clients")
+                    try:
+                        # A failed ping means the process is gone; raising restarts it
+                        while True:
+                            await asyncio.sleep(PING_INTERVAL)
+                            await asyncio.wait_for(session.send_ping(), PING_INTERVAL)
+                    finally:
+                        self._ready.clear()
+                        self.session = None
+
+    async def get_session(self, timeout: float = 30.0) -> ClientSession:
+        await asyncio.wait_for(self._ready.wait(), timeout)
+        return self.session
+
+
+def create_sse_app(bridge: StdioBridge):
+    """Starlette app exposing the bridged stdio server at ``/sse``."""
+    from contextlib import asynccontextmanager
+
+    from mcp.server.lowlevel import Server
+    from mcp.server.sse import SseServerTransport
+    from starlette.applications import Starlette
+    from starlette.responses import Response
+    from starlette.routing import Mount, Route
+
+    proxy = Server("mcp-flight-search-bridge")
+
+    @proxy.list_tools()
+    async def list_tools():
+        return (await (await bridge.get_session()).list_tools()).tools
+
+    @proxy.call_tool(validate_input=False)
+    async def call_tool(name: str, arguments: dict):
+        # Forward the whole result so isError and structured content survive
+        return await (await bridge.get_session()).call_tool(name, arguments)
+
+    sse = SseServerTransport("/messages/")
+
+    async def handle_sse(request):
+        async with sse.connect_sse(request.scope, request.receive, request._send) as (read, write):
+            await proxy.run(read, write, proxy.create_initialization_options())
+        return Response()
+
+    @asynccontextmanager
+    async def lifespan(app):
+        task = asyncio.create_task(bridge.supervisor.run())
+        try:
+            yield
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    return Starlette(
+        routes=[
+            Route("/sse", endpoint=handle_sse, methods=["GET"]),
+            Mount("/messages/", app=sse.handle_post_message),
+        ],
+        lifespan=lifespan,
+    )
+
+
+def run_server(sse: bool = False, host: str = "127.0.0.1", port: int = 8765):
+    print("Starting MCP Flight Search server...")
+    mcp_flights_search = find_flight_search()
+    env = {"SERP_API_KEY": os.getenv("SERP_API_KEY")}
+
     try:
-        # Start the server process with the full path
-        process = subprocess.Popen(
-            [mcp_flights_search, "--connection_type", "stdio"],
-            env={"SERP_API_KEY": os.getenv("SERP_API_KEY")},
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
-        
-        print("Server started successfully!")
-        print("Waiting for input...")
-        
-        # Keep the process running
-        process.wait()
-        
+        if sse:
+            import uvicorn
+
+            server_params = StdioServerParameters(
+                command=mcp_flights_search, args=["--connection_type", "stdio"], env=env
+            )
+            print(f"Serving one shared stdio server over SSE at http://{host}:{port}/sse")
+            uvicorn.run(create_sse_app(StdioBridge(server_params)), host=host, port=port)
+        else:
+            # Start the server process with the full path and keep it running
+            command = [mcp_flights_search, "--connection_type", "stdio"]
+            asyncio.run(Supervisor("mcp-flight-search", lambda: run_process_once(command, env)).run())
+
+    except KeyboardInterrupt:
+        print("Server stopped")
     except Exception as e:
         print(f"Error starting server: {e}")
         sys.exit(1)
 
 if __name__ == "__main__":
-    run_server()
+    parser = argparse.ArgumentParser(description="Supervised MCP flight search server")
+    parser.add_argument("--sse", action="store_true", help="share one stdio server with many clients over SSE")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    run_server(sse=args.sse, host=args.host, port=args.port)
@@ -0,0 +1,164 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+logger = logging.getLogger(__name__)
+
+
+class CachePolicy(NamedTuple):
+    ttl: float             # seconds an entry is served as fresh
+    stale_ttl: float       # extra seconds it may be served stale while refreshing
+    max_entries: int       # LRU bound for the service
+
+
+DEFAULT_POLICY = CachePolicy(ttl=60, stale_ttl=300, max_entries=1000)
+
+
+def normalize(value):
+    """Canonical form of a payload: sorted keys, trimmed lower-case strings."""
+    if isinstance(value, dict):
+        return {str(k): normalize(v) for k, v in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        return [normalize(v) for v in value]
+    if isinstance(value, str):
+        return value.strip().lower()
+    return value
+
+
+def cache_key(payload: dict) -> str:
+    return json.dumps(normalize(payload), sort_keys=True, separators=(",", ":"))
+
+
+def is_cacheable(result) -> bool:
+    """Error results from ``fetch_data`` must never be cached."""
+    return not (isinstance(result, dict) and "error" in result)
+
+
+class ResponseCache:
+    """Per-service TTL + LRU cache with stale-while-revalidate.
+
+    Fresh entries are returned directly. Entries past their TTL but within
+    ``stale_ttl`` are returned immediately while a single background task
+    refreshes them. Anything older is a miss and is fetched inline.
+
+    With a ``shared`` store (see ``shared_store.SharedResultStore``), local
+    misses are looked up there before fetching and every fetched result is
+    written through, so workers on one host share each other's lookups.
+    """
+
+    def __init__(self, policies: dict = None, default_policy: CachePolicy = DEFAULT_POLICY, shared=None):
+        self.policies = dict(policies or {})
+        self.default_policy = default_policy
+        self.shared = shared
+        self._entries = {}
+        self._counters = {}
+        self._refreshing = set()
+        self._tasks = set()
+
+    def _service(self, service_name: str):
+        if service_name not in self._entries:
+            self._entries[service_name] = OrderedDict()
+            self._counters[service_name] = {
+                "hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "evictions": 0, "shared_hits": 0,
+            }
+        return self._entries[service_name], self._counters[service_name]
+
+    def policy(self, service_name: str) -> CachePolicy:
+        return self.policies.get(service_name, self.default_policy)
+
+    def _store(self, service_name: str, key: str, result, stored_at: float = None, publish: bool = True):
+        if not is_cacheable(result):
+            return
+        entries, counters = self._service(service_name)
+        entries[key] = (result, stored_at if stored_at is not None else time.monotonic())
+        entries.move_to_end(key)
+        while len(entries) > self.policy(service_name).max_entries:
+            entries.popitem(last=False)
+            counters["evictions"] += 1
+        if publish and self.shared is not None:
+            policy = self.policy(service_name)
+            self._spawn(self.shared.put(service_name, key, result, policy.ttl + policy.stale_ttl))
+
+    async def _load_shared(self, service_name: str, key: str):
+        """Copy another worker's result for ``key`` into the local cache, keeping its age."""
+        found = await self.shared.get(service_name, key)
+        if found is None:
+            return None
+        result, stored_at = found
+        local_stored_at = time.monotonic() - max(0.0, time.time() - stored_at)
+        self._store(service_name, key, result, stored_at=local_stored_at, publish=False)
+        self._counters[service_name]["shared_hits"] += 1
+        return result, local_stored_at
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def get_or_fetch(self, service_name: str, payload: dict, fetch):
+        """Return the cached result for ``payload`` or await ``fetch()`` to produce it."""
+        entries, counters = self._service(service_name)
+        policy = self.policy(service_name)
+        key = cache_key(payload)
+        entry = entries.get(key)
+        if entry is None and self.shared is not None:
+            entry = await self._load_shared(service_name, key)
+
+        if entry is not None:
+            result, stored_at = entry
+            age = time.monotonic() - stored_at
+            if age < policy.ttl:
+                counters["hits"] += 1
+                entries.move_to_end(key)
+                return result
+            if age < policy.ttl + policy.stale_ttl:
+                counters["stale_hits"] += 1
+                entries.move_to_end(key)
+                self._refresh(service_name, key, fetch)
+                return result
+            del entries[key]
+
+        counters["misses"] += 1
+        result = await fetch()
+        self._store(service_name, key, result)
+        return result
+
+    def _refresh(self, service_name: str, key: str, fetch):
+        if (service_name, key) in self._refreshing:
+            return
+        self._refreshing.add((service_name, key))
+
+        async def refresh():
+            try:
+                self._store(service_name, key, await fetch())
+                self._counters[service_name]["refreshes"] += 1
+            except Exception as e:
+                logger.error(f"Background refresh failed for {service_name}: {e}")
+            finally:
+                self._refreshing.discard((service_name, key))
+
+        self._spawn(refresh())
+
+    async def stats(self) -> dict:
+        stats = {
+            service_name: {
+                **counters,
+                "size": len(self._entries[service_name]),
+                "max_entries": self.policy(service_name).max_entries,
+                "ttl": self.policy(service_name).ttl,
+                "stale_ttl": self.policy(service_name).stale_ttl,
+            }
+            for service_name, counters in self._counters.items()
+        }
+        if self.shared is not None:
+            stats["shared_store"] = await self.shared.stats()
+        return stats
+
+    async def aclose(self):
+        """Cancel any background refreshes still in flight."""
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
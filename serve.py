@@ -0,0 +1,72 @@
+"""Production launcher: run either trip server as N worker processes.
+
+Usage: python serve.py fastapi|flask [--workers N] [--host 0.0.0.0] [--port 8000]
+       [--shared-cache PATH]
+
+The FastAPI app runs as uvicorn workers. The Flask app runs under gunicorn
+with gthread workers (``pip install gunicorn``); each worker gets enough
+threads to fill its admission limit and queues, so overload is shed with a
+503 by the admission controller instead of queueing unseen in front of it.
+Each worker keeps its own connection pools and in-memory cache, and all of
+them share upstream results through a SQLite file, so a lookup fetched by
+one worker is a cache hit for the rest and survives a restart.
+"""
+import argparse
+import os
+import sys
+
+import uvicorn
+
+from admission import MAX_IN_FLIGHT, QUEUE_LIMITS
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+APPS = {
+    # name -> (import string, app dir)
+    "fastapi": ("server:app", os.path.join(ROOT, "Server")),
+    "flask": ("web:app", ROOT),
+}
+# Request threads per Flask worker: one per admission slot plus one per queued waiter
+FLASK_THREADS = int(os.getenv("FLASK_THREADS", str(MAX_IN_FLIGHT + sum(QUEUE_LIMITS.values()))))
+DEFAULT_SHARED_CACHE = os.path.join(ROOT, "cache", "upstream_results.sqlite3")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("app", choices=sorted(APPS))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--shared-cache", default=os.getenv("SHARED_CACHE_PATH", DEFAULT_SHARED_CACHE),
+                        help="SQLite file shared by the workers; empty to disable")
+    args = parser.parse_args()
+
+    # Workers read their configuration from the environment when they import the app
+    if args.shared_cache:
+        os.environ["SHARED_CACHE_PATH"] = args.shared_cache
+    else:
+        os.environ.pop("SHARED_CACHE_PATH", None)
+
+    target, app_dir = APPS[args.app]
+    print(f"Serving {args.app} on {args.host}:{args.port} with {args.workers} workers "
+          f"(shared cache: {args.shared_cache or 'off'})")
+    if args.app == "flask":
+        serve_wsgi(target, app_dir, args)
+    else:
+        uvicorn.run(target, app_dir=app_dir, host=args.host, port=args.port,
+                    workers=args.workers, log_level="info")
+
+
+def serve_wsgi(target: str, app_dir: str, args):
+    from gunicorn.app.wsgiapp import WSGIApplication
+
+    sys.argv = [
+        "gunicorn", target, "--chdir", app_dir, "--bind", f"{args.host}:{args.port}",
+        "--workers", str(args.workers), "--worker-class", "gthread", "--threads", str(FLASK_THREADS),
+        "--log-level", "info",
+    ]
+    WSGIApplication("%(prog)s [OPTIONS] [APP_MODULE]").run()
+
+
+if __name__ == "__main__":
+    main()
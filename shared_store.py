@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import fastjson
+
+logger = logging.getLogger(__name__)
+
+# How many writes between expiry/size-cap sweeps
+SWEEP_EVERY = 200
+
+
+class SharedResultStore:
+    """Upstream results shared by every worker process on the host.
+
+    A SQLite database in WAL mode, so readers in one worker never block on
+    another worker's write. Entries expire ``ttl`` seconds after they are
+    stored, and the oldest entries are dropped once there are more than
+    ``max_entries``. The file outlives the workers, so a restart starts warm.
+
+    The blocking calls run in a thread; use ``get``/``put`` from async code.
+    """
+
+    def __init__(self, path: str, max_entries: int = 50000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connection() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "service TEXT, key TEXT, value TEXT, stored_at REAL, expires_at REAL, "
+                "PRIMARY KEY (service, key))"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS results_stored_at ON results (stored_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread; sqlite3 connections must not be shared
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _get(self, service_name: str, key: str):
+        row = self._connection().execute(
+            "SELECT value, stored_at FROM results WHERE service = ? AND key = ? AND expires_at > ?",
+            (service_name, key, time.time()),
+        ).fetchone()
+        if row is None:
+            return None
+        return fastjson.loads(row[0]), row[1]
+
+    def _put(self, service_name: str, key: str, value, ttl: float):
+        now = time.time()
+        with self._connection() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                (service_name, key, fastjson.dumps_str(value), now, now + ttl),
+            )
+        self._writes += 1
+        if self._writes % SWEEP_EVERY == 0:
+            self._sweep()
+
+    def _sweep(self):
+        with self._connection() as db:
+            db.execute("DELETE FROM results WHERE expires_at <= ?", (time.time(),))
+            overflow = db.execute("SELECT COUNT(*) FROM results").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                db.execute(
+                    "DELETE FROM results WHERE rowid IN (SELECT rowid FROM results ORDER BY stored_at LIMIT ?)",
+                    (overflow,),
+                )
+
+    async def get(self, service_name: str, key: str):
+        """``(value, stored_at)`` with ``stored_at`` in wall-clock seconds, or None."""
+        try:
+            return await asyncio.to_thread(self._get, service_name, key)
+        except sqlite3.Error as e:
+            logger.warning(f"Shared result store read failed: {e}")
+            return None
+
+    async def put(self, service_name: str, key: str, value, ttl: float):
+        try:
+            await asyncio.to_thread(self._put, service_name, key, value, ttl)
+        except sqlite3.Error as e:
+            logger.warning(f"Shared result store write failed: {e}")
+
+    def _stats(self) -> dict:
+        row = self._connection().execute("SELECT COUNT(*) FROM results").fetchone()
+        return {"path": self.path, "entries": row[0], "max_entries": self.max_entries}
+
+    async def stats(self) -> dict:
+        try:
+            return await asyncio.to_thread(self._stats)
+        except sqlite3.Error as e:
+            logger.warning(f"Shared result store stats failed: {e}")
+            return {"path": self.path, "error": str(e)}
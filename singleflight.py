@@ -0,0 +1,35 @@
+import asyncio
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key onto one in-flight task.
+
+    The first caller for a key runs the work; callers arriving while it is
+    still running await the same task instead of starting their own. Keys
+    are ``(group, ...)`` tuples and counters are kept per group.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self._counters = {}
+
+    async def do(self, key: tuple, fn):
+        """Return the result of ``fn()``, shared with concurrent callers using ``key``."""
+        counters = self._counters.setdefault(key[0], {"calls": 0, "executions": 0, "coalesced": 0})
+        counters["calls"] += 1
+
+        task = self._inflight.get(key)
+        if task is None:
+            counters["executions"] += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            counters["coalesced"] += 1
+
+        # Shield so a cancelled caller does not cancel the work for the others
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        return {group: {**counters, "in_flight": sum(1 for key in self._inflight if key[0] == group)}
+                for group, counters in self._counters.items()}
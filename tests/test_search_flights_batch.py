@@ -0,0 +1,41 @@
+import asyncio
+import contextlib
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("ANTHROPIC_API_KEY", "test")
+os.environ.setdefault("SERP_API_KEY", "test")
+
+import server  # noqa: E402
+
+
+class FakeSession:
+    async def call_tool(self, name, arguments):
+        flights = [{"airline": "A", "price": "$120"}, {"airline": "B", "price": "$120"},
+                   {"airline": "C", "price": "$90"}]
+        return SimpleNamespace(isError=False, content=[SimpleNamespace(text=json.dumps({"flights": flights}))])
+
+
+class FakePool:
+    @contextlib.asynccontextmanager
+    async def session(self):
+        yield FakeSession()
+
+
+class PassThroughCache:
+    async def call(self, tool_name, arguments, fetch, scope=""):
+        return await fetch()
+
+
+def test_equal_prices_do_not_break_the_top_k_heap(monkeypatch):
+    monkeypatch.setattr(server, "flight_server_pool", FakePool())
+    monkeypatch.setattr(server, "flight_tool_cache", PassThroughCache())
+
+    found = asyncio.run(server.search_flights_batch(["ATL"], ["LAS", "JFK"], ["2026-06-01"], top_k=3))
+
+    assert found["stats"]["completed"] == 2
+    assert [server.price_of(flight) for flight in found["cheapest"]] == [90.0, 90.0, 120.0]
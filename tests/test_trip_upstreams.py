@@ -0,0 +1,65 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import trip_upstreams  # noqa: E402
+from circuit_breaker import HALF_OPEN  # noqa: E402
+from upstream_pool import UpstreamPool  # noqa: E402
+
+
+def test_cancelled_hedge_is_not_recorded_as_a_failure(monkeypatch):
+    calls = []
+
+    async def fetch_data(client, url, payload, service_name, timeout=10):
+        calls.append(service_name)
+        # The first attempt stalls so the hedge wins and the first is cancelled
+        await asyncio.sleep(1.0 if len(calls) == 1 else 0.01)
+        return {"hotels": []}
+
+    monkeypatch.setattr(trip_upstreams, "fetch_data", fetch_data)
+    monkeypatch.setattr(trip_upstreams, "HEDGING_ENABLED", True)
+
+    async def run():
+        upstreams = trip_upstreams.TripUpstreams(UpstreamPool())
+        for _ in range(trip_upstreams.HEDGE_MIN_SAMPLES):
+            upstreams.latencies.record("Hotels", 0.01)
+        limiter, breaker = upstreams.limiters["Hotels"], upstreams.breakers["Hotels"]
+        initial_limit = limiter.limit
+        result = await upstreams._call_upstream("Hotels", {"destination": "LAS"})
+        await asyncio.sleep(0)
+        await upstreams.aclose()
+        return result, limiter, breaker, initial_limit
+
+    result, limiter, breaker, initial_limit = asyncio.run(run())
+
+    assert result == {"hotels": []}
+    assert len(calls) == 2
+    assert limiter.in_flight == 0
+    assert limiter.limit >= initial_limit
+    assert breaker.failure_rate() == 0.0
+
+
+def test_unexpected_error_frees_the_slot_and_the_half_open_probe(monkeypatch):
+    async def run():
+        upstreams = trip_upstreams.TripUpstreams(UpstreamPool())
+        limiter, breaker = upstreams.limiters["Hotels"], upstreams.breakers["Hotels"]
+        breaker._transition(HALF_OPEN)
+
+        def closed_pool(service_name):
+            raise RuntimeError("pool is closed")
+
+        monkeypatch.setattr(upstreams.pool, "client", closed_pool)
+        with pytest.raises(RuntimeError):
+            await upstreams._call_upstream("Hotels", {"destination": "LAS"})
+        return limiter, breaker
+
+    limiter, breaker = asyncio.run(run())
+
+    assert limiter.in_flight == 0
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
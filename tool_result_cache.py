@@ -0,0 +1,111 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from contextlib import closing
+
+from mcp import types
+from pydantic import ValidationError
+
+logger = logging.getLogger(__name__)
+
+
+def tool_cache_key(tool_name: str, arguments: dict, scope: str = "") -> str:
+    """Tool name plus canonical JSON arguments, so key order and spacing don't matter."""
+    canonical = json.dumps(arguments or {}, sort_keys=True, separators=(",", ":"), default=str)
+    return f"{scope}/{tool_name}:{canonical}"
+
+
+class ToolResultCache:
+    """Memoizes ``call_tool`` results for an allowlist of side-effect-free tools.
+
+    ``ttls`` maps tool name to seconds; tools not listed are never cached,
+    and error results are never stored. Results live in an in-memory LRU
+    and, when ``disk_path`` is set, in a SQLite file that survives restarts
+    and is consulted on a memory miss.
+    """
+
+    def __init__(self, ttls: dict, max_entries: int = 1000, disk_path: str = None):
+        self.ttls = dict(ttls)
+        self.max_entries = max_entries
+        self.disk_path = disk_path
+        self._memory = OrderedDict()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "bypassed": 0}
+        if disk_path:
+            os.makedirs(os.path.dirname(os.path.abspath(disk_path)), exist_ok=True)
+            with self._connect() as db, db:
+                db.execute("CREATE TABLE IF NOT EXISTS tool_results (key TEXT PRIMARY KEY, value TEXT, expires REAL)")
+
+    def _connect(self):
+        # sqlite3's own context manager only commits; closing() releases the file handle
+        return closing(sqlite3.connect(self.disk_path, timeout=5))
+
+    def _disk_get(self, key: str):
+        with self._connect() as db:
+            row = db.execute("SELECT value, expires FROM tool_results WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return row
+
+    def _disk_put(self, key: str, value: str, expires: float):
+        with self._connect() as db, db:
+            db.execute("INSERT OR REPLACE INTO tool_results VALUES (?, ?, ?)", (key, value, expires))
+            db.execute("DELETE FROM tool_results WHERE expires < ?", (time.time(),))
+
+    def _disk_delete(self, key: str):
+        with self._connect() as db, db:
+            db.execute("DELETE FROM tool_results WHERE key = ?", (key,))
+
+    def _remember(self, key: str, result, expires: float):
+        self._memory[key] = (result, expires)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    async def call(self, tool_name: str, arguments: dict, fetch, scope: str = ""):
+        """Return a cached result for this tool call, or await ``fetch()`` and cache it."""
+        ttl = self.ttls.get(tool_name)
+        if ttl is None:
+            self._stats["bypassed"] += 1
+            return await fetch()
+
+        key = tool_cache_key(tool_name, arguments, scope)
+        entry = self._memory.get(key)
+        if entry is not None and entry[1] > time.time():
+            self._memory.move_to_end(key)
+            self._stats["memory_hits"] += 1
+            return entry[0]
+
+        if self.disk_path:
+            row = await asyncio.to_thread(self._disk_get, key)
+            if row is not None:
+                try:
+                    result = types.CallToolResult.model_validate_json(row[0])
+                except ValidationError as e:
+                    # Corrupt or written by an older schema; refetch and overwrite it
+                    logger.warning(f"Dropping unreadable cached result for {tool_name}: {e}")
+                    await asyncio.to_thread(self._disk_delete, key)
+                else:
+                    self._remember(key, result, row[1])
+                    self._stats["disk_hits"] += 1
+                    return result
+
+        self._stats["misses"] += 1
+        result = await fetch()
+        if getattr(result, "isError", False):
+            return result
+        expires = time.time() + ttl
+        self._remember(key, result, expires)
+        if self.disk_path:
+            try:
+                await asyncio.to_thread(self._disk_put, key, result.model_dump_json(), expires)
+            except Exception as e:
+                logger.warning(f"Could not persist cached result for {tool_name}: {e}")
+        self._stats["stores"] += 1
+        return result
+
+    def stats(self) -> dict:
+        return {**self._stats, "memory_entries": len(self._memory), "cached_tools": sorted(self.ttls)}
@@ -0,0 +1,360 @@
+import asyncio
+import logging
+import os
+import time
+
+import httpx
+
+import fastjson
+from circuit_breaker import AdaptiveLimiter, CircuitBreaker
+from instrumentation import UPSTREAM_ERRORS, UPSTREAM_IN_FLIGHT, UPSTREAM_LATENCY, span
+from latency_budget import LatencyTracker, hedged, is_success
+from response_cache import CachePolicy, ResponseCache, cache_key
+from shared_store import SharedResultStore
+from singleflight import SingleFlight
+from upstream_pool import UpstreamPool
+from upstream_records import COMPACT_PAYLOADS, compact_result
+
+# External API endpoints (replace with actual endpoints or use API gateways);
+# each can be overridden from the environment, e.g. to point at local stubs
+MAPS_MCP_URL = os.getenv("MAPS_MCP_URL", "https://your-maps-mcp-server.com/api/maps")
+FLIGHT_API_URL = os.getenv("FLIGHT_API_URL", "https://your-flights-api.com/api/flights")
+HOTEL_API_URL = os.getenv("HOTEL_API_URL", "https://your-hotels-api.com/api/hotels")
+UBER_API_URL = os.getenv("UBER_API_URL", "https://your-transport-api.com/api/uber")
+
+# Service name -> endpoint; the itinerary section is the lower-cased name
+SERVICES = {
+    "Maps": MAPS_MCP_URL,
+    "Flights": FLIGHT_API_URL,
+    "Hotels": HOTEL_API_URL,
+    "Transport": UBER_API_URL,
+}
+
+# Per-upstream connection limits; flights and hotels see the most traffic
+UPSTREAM_LIMITS = {
+    "Maps": httpx.Limits(max_connections=20, max_keepalive_connections=20, keepalive_expiry=30.0),
+    "Flights": httpx.Limits(max_connections=50, max_keepalive_connections=50, keepalive_expiry=30.0),
+    "Hotels": httpx.Limits(max_connections=50, max_keepalive_connections=50, keepalive_expiry=30.0),
+    "Transport": httpx.Limits(max_connections=20, max_keepalive_connections=20, keepalive_expiry=30.0),
+}
+UPSTREAM_HTTP2 = os.getenv("UPSTREAM_HTTP2", "0") == "1"
+
+# Per-upstream response caching; flights and hotels are the most repeated and
+# most expensive lookups, maps data barely changes, transport quotes go stale fast
+CACHE_POLICIES = {
+    "Maps": CachePolicy(ttl=3600, stale_ttl=86400, max_entries=1000),
+    "Flights": CachePolicy(ttl=120, stale_ttl=600, max_entries=5000),
+    "Hotels": CachePolicy(ttl=300, stale_ttl=900, max_entries=5000),
+    "Transport": CachePolicy(ttl=30, stale_ttl=60, max_entries=500),
+}
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE", "1") == "1"
+# With several worker processes, point this at a local file so workers share
+# cached upstream results (and keep them across restarts)
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH")
+SHARED_CACHE_MAX_ENTRIES = int(os.getenv("SHARED_CACHE_MAX_ENTRIES", "50000"))
+
+# Per-upstream deadline in seconds; a request-level budget can only shorten it
+SERVICE_TIMEOUTS = {
+    "Maps": 3.0,
+    "Flights": 8.0,
+    "Hotels": 8.0,
+    "Transport": 3.0,
+}
+# Hedging fires a second attempt once a call is slower than the service's
+# recent p95; it needs enough samples to trust that p95
+HEDGING_ENABLED = os.getenv("UPSTREAM_HEDGING", "0") == "1"
+HEDGE_QUANTILE = 0.95
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY = 0.05
+
+# Breakers and in-flight limits treat a call slower than half the service
+# deadline as a failure, so a degrading upstream is shed before it times out
+BREAKER_WINDOW = 20
+BREAKER_MIN_CALLS = 10
+BREAKER_FAILURE_RATE = 0.5
+BREAKER_OPEN_SECONDS = 30.0
+CONCURRENCY_LIMITS = {
+    "Maps": 20,
+    "Flights": 50,
+    "Hotels": 50,
+    "Transport": 20,
+}
+
+# Batch planning: most trips per request, and upstream calls in flight at once
+# across the whole batch
+MAX_BATCH_TRIPS = 50
+BATCH_CONCURRENCY = 16
+
+
+def create_upstream_pool() -> UpstreamPool:
+    return UpstreamPool(limits=UPSTREAM_LIMITS, http2=UPSTREAM_HTTP2)
+
+
+async def fetch_data(client: httpx.AsyncClient, url: str, payload: dict, service_name: str, timeout: float = 10):
+    try:
+        # httpx applies ``timeout`` to connect and each read on their own;
+        # asyncio.timeout makes it a deadline for the whole call
+        async with asyncio.timeout(timeout):
+            response = await client.post(url, json=payload, timeout=timeout)
+            response.raise_for_status()
+            return fastjson.loads(response.content)
+    except TimeoutError:
+        logging.error(f"Timeout of {timeout}s exceeded in {service_name}")
+        return {"error": f"Timeout of {timeout}s exceeded for {service_name}"}
+    except httpx.HTTPError as http_err:
+        logging.error(f"HTTP error in {service_name}: {http_err}")
+        return {"error": f"HTTP error from {service_name}: {str(http_err)}"}
+    except Exception as e:
+        logging.error(f"Unhandled error in {service_name}: {e}")
+        return {"error": f"Unhandled error from {service_name}: {str(e)}"}
+
+
+def section_statuses(itinerary: dict) -> dict:
+    return {section: "ok" if is_success(result) else "error" for section, result in itinerary.items()}
+
+
+def trip_result(itinerary: dict, partial: bool = False) -> dict:
+    """Status for one planned trip, with the same rules as a single /plan-trip."""
+    sections = section_statuses(itinerary)
+    if "error" not in sections.values():
+        return {"status": "success", "itinerary": itinerary}
+    if partial and "ok" in sections.values():
+        return {"status": "partial", "sections": sections, "itinerary": itinerary}
+    return {"status": "error", "sections": sections, "itinerary": itinerary}
+
+
+class TripUpstreams:
+    """The pooled clients and response cache shared by a trip server process.
+
+    Identical concurrent work is coalesced at two levels: whole itineraries
+    keyed on the normalized trip request, and single upstream calls keyed
+    on ``(service, payload)``. Each upstream call is bounded by its entry in
+    ``SERVICE_TIMEOUTS``, guarded by a per-service circuit breaker and
+    adaptive in-flight limit, and may be hedged when ``UPSTREAM_HEDGING=1``.
+    """
+
+    def __init__(self, pool: UpstreamPool, cache: ResponseCache = None):
+        self.pool = pool
+        self.cache = cache
+        self.singleflight = SingleFlight()
+        self._tasks = set()
+        self.latencies = LatencyTracker()
+        self.hedges = {}
+        self.breakers = {
+            service_name: CircuitBreaker(
+                service_name,
+                window=BREAKER_WINDOW,
+                min_calls=BREAKER_MIN_CALLS,
+                failure_rate_threshold=BREAKER_FAILURE_RATE,
+                slow_call_threshold=SERVICE_TIMEOUTS[service_name] / 2,
+                open_duration=BREAKER_OPEN_SECONDS,
+            )
+            for service_name in SERVICES
+        }
+        self.limiters = {
+            service_name: AdaptiveLimiter(
+                initial_limit=CONCURRENCY_LIMITS[service_name],
+                max_limit=CONCURRENCY_LIMITS[service_name] * 4,
+                latency_target=SERVICE_TIMEOUTS[service_name] / 2,
+            )
+            for service_name in SERVICES
+        }
+
+    async def _call_upstream(self, service_name: str, payload: dict):
+        timeout = SERVICE_TIMEOUTS.get(service_name, 10)
+        breaker = self.breakers[service_name]
+        limiter = self.limiters[service_name]
+
+        async def attempt():
+            # Take the limiter slot first so a rejection here never strands a half-open probe
+            if not limiter.try_acquire():
+                UPSTREAM_ERRORS.inc(service=service_name, reason="concurrency_limit")
+                return {"error": f"Concurrency limit reached for {service_name}"}
+            # Fail fast instead of waiting on an upstream known to be unhealthy
+            if not breaker.allow():
+                limiter.abandon()
+                UPSTREAM_ERRORS.inc(service=service_name, reason="circuit_open")
+                return {"error": f"Circuit open for {service_name}"}
+            start = time.perf_counter()
+            success = False
+            try:
+                with UPSTREAM_IN_FLIGHT.track(service=service_name):
+                    client = self.pool.client(service_name)
+                    result = await fetch_data(client, SERVICES[service_name], payload, service_name, timeout)
+                success = is_success(result)
+                if success and COMPACT_PAYLOADS:
+                    # Cache and return the compact records, not the whole upstream blob
+                    result = compact_result(service_name, result)
+            except BaseException:
+                # Cancelled (e.g. the losing hedge) or failed before an outcome:
+                # says nothing about upstream health, but the slot must be freed
+                limiter.abandon()
+                breaker.release_probe()
+                raise
+            else:
+                latency = time.perf_counter() - start
+                limiter.release(success, latency)
+                breaker.record(success, latency)
+                UPSTREAM_LATENCY.observe(latency, service=service_name, outcome="ok" if success else "error")
+            if success:
+                self.latencies.record(service_name, latency)
+            else:
+                UPSTREAM_ERRORS.inc(service=service_name, reason="upstream_error")
+            return result
+
+        if not HEDGING_ENABLED or self.latencies.count(service_name) < HEDGE_MIN_SAMPLES:
+            return await attempt()
+
+        def on_hedge():
+            self.hedges[service_name] = self.hedges.get(service_name, 0) + 1
+
+        delay = max(HEDGE_MIN_DELAY, self.latencies.percentile(service_name, HEDGE_QUANTILE))
+        return await hedged(attempt, delay, on_hedge)
+
+    async def fetch(self, service_name: str, payload: dict, budget: float = None):
+        """Call one upstream, going through the response cache when enabled.
+
+        The wait is capped by the service's ``SERVICE_TIMEOUTS`` entry, which
+        ``budget`` (seconds left for this caller) can only shorten. On expiry
+        an error result is returned, while the call itself carries on so its
+        result still lands in the cache for the next request.
+        """
+        def fetch():
+            return self.singleflight.do(
+                (service_name, cache_key(payload)), lambda: self._call_upstream(service_name, payload)
+            )
+
+        with span("upstream", service=service_name) as current:
+            call = fetch() if self.cache is None else self.cache.get_or_fetch(service_name, payload, fetch)
+            task = asyncio.ensure_future(call)
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            deadline = SERVICE_TIMEOUTS.get(service_name, 10)
+            if budget is not None:
+                deadline = max(0.0, min(budget, deadline))
+            try:
+                async with asyncio.timeout(deadline):
+                    result = await asyncio.shield(task)
+            except TimeoutError:
+                logging.error(f"Deadline of {deadline}s exceeded for {service_name}")
+                UPSTREAM_ERRORS.inc(service=service_name, reason="deadline")
+                result = {"error": f"Deadline of {deadline}s exceeded for {service_name}"}
+            if current is not None:
+                current.attributes["status"] = "ok" if is_success(result) else "error"
+            return result
+
+    async def fetch_itinerary(self, payload: dict, budget: float = None) -> dict:
+        """Query every upstream concurrently and return the itinerary sections."""
+        async def fetch_all():
+            results = await asyncio.gather(*(self.fetch(service_name, payload, budget) for service_name in SERVICES))
+            return {service_name.lower(): result for service_name, result in zip(SERVICES, results)}
+
+        # Child upstream spans are opened in tasks that copy this context
+        with span("plan-trip", origin=payload.get("origin"), destination=payload.get("destination")):
+            return await self.singleflight.do(("itinerary", cache_key(payload), budget), fetch_all)
+
+    async def fetch_itineraries(self, payloads: list, budget: float = None,
+                                max_concurrency: int = BATCH_CONCURRENCY) -> tuple:
+        """Plan several trips at once; returns ``(itineraries, stats)`` in input order.
+
+        Every upstream is sent the unmodified trip, so identical trips in the
+        batch share one call per service. At most ``max_concurrency``
+        upstream calls run at a time.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        start = time.perf_counter()
+        calls = {}
+        for payload in payloads:
+            for service_name in SERVICES:
+                calls.setdefault((service_name, cache_key(payload)), payload)
+
+        async def limited(service_name, payload):
+            async with semaphore:
+                # The budget covers the whole batch, including the wait for a slot
+                remaining = None if budget is None else budget - (time.perf_counter() - start)
+                return await self.fetch(service_name, payload, remaining)
+
+        keys = list(calls)
+        with span("plan-trips", trips=len(payloads)):
+            results = await asyncio.gather(*(limited(service_name, calls[service_name, key])
+                                             for service_name, key in keys))
+        by_call = dict(zip(keys, results))
+
+        itineraries = [
+            {service_name.lower(): by_call[service_name, cache_key(payload)] for service_name in SERVICES}
+            for payload in payloads
+        ]
+        requested = len(payloads) * len(SERVICES)
+        stats = {"trips": len(payloads), "upstream_calls": len(keys), "deduplicated": requested - len(keys)}
+        return itineraries, stats
+
+    async def stream_itinerary(self, payload: dict, budget: float = None):
+        """Yield each itinerary section as soon as its upstream answers, then a summary.
+
+        Section events look like ``{"event": "section", "section": "flights",
+        "status": "ok", "elapsed_ms": 12.3, "data": {...}}``; the final event
+        is ``{"event": "summary", "status": "success" | "error", ...}``.
+        """
+        start = time.perf_counter()
+
+        async def fetch_section(service_name):
+            return service_name.lower(), await self.fetch(service_name, payload, budget)
+
+        statuses = {}
+        tasks = [asyncio.ensure_future(fetch_section(service_name)) for service_name in SERVICES]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                section, result = await next_done
+                statuses[section] = "ok" if is_success(result) else "error"
+                yield {
+                    "event": "section",
+                    "section": section,
+                    "status": statuses[section],
+                    "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+                    "data": result,
+                }
+        finally:
+            # The consumer may stop early (e.g. client disconnected)
+            for task in tasks:
+                task.cancel()
+
+        yield {
+            "event": "summary",
+            "status": "error" if "error" in statuses.values() else "success",
+            "sections": statuses,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+        }
+
+    async def cache_stats(self) -> dict:
+        return await self.cache.stats() if self.cache is not None else {}
+
+    def coalescing_stats(self) -> dict:
+        return self.singleflight.stats()
+
+    def breaker_stats(self) -> dict:
+        return {
+            service_name: {**self.breakers[service_name].stats(), "concurrency": self.limiters[service_name].stats()}
+            for service_name in SERVICES
+        }
+
+    def latency_stats(self) -> dict:
+        stats = self.latencies.stats()
+        for service_name, service_stats in stats.items():
+            service_stats["timeout"] = SERVICE_TIMEOUTS.get(service_name)
+            service_stats["hedges"] = self.hedges.get(service_name, 0)
+        return stats
+
+    async def aclose(self):
+        # Calls still finishing after their caller's deadline
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self.cache is not None:
+            await self.cache.aclose()
+        await self.pool.aclose()
+
+
+def create_trip_upstreams() -> TripUpstreams:
+    shared = SharedResultStore(SHARED_CACHE_PATH, SHARED_CACHE_MAX_ENTRIES) if SHARED_CACHE_PATH else None
+    cache = ResponseCache(CACHE_POLICIES, shared=shared) if RESPONSE_CACHE_ENABLED else None
+    return TripUpstreams(create_upstream_pool(), cache)
@@ -0,0 +1,96 @@
+import logging
+import importlib.util
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Defaults applied to any upstream without an explicit entry in ``limits``
+DEFAULT_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=20, keepalive_expiry=30.0)
+
+# httpcore trace events emitted when a brand new connection is set up
+TCP_CONNECT_EVENT = "connection.connect_tcp.complete"
+TLS_HANDSHAKE_EVENT = "connection.start_tls.complete"
+
+
+def http2_available() -> bool:
+    """HTTP/2 needs the optional ``h2`` package (``pip install httpx[http2]``)."""
+    return importlib.util.find_spec("h2") is not None
+
+
+class UpstreamPool:
+    """Long-lived keep-alive HTTP clients, one per upstream service.
+
+    Each service gets its own ``httpx.AsyncClient`` so connection limits are
+    enforced per upstream and one slow service cannot starve the others of
+    pooled connections. Create it once per process (e.g. in an app lifespan)
+    and call ``aclose`` on shutdown.
+    """
+
+    def __init__(self, limits: dict = None, http2: bool = False, default_limits: httpx.Limits = DEFAULT_LIMITS):
+        if http2 and not http2_available():
+            logger.warning("HTTP/2 requested but the 'h2' package is not installed, falling back to HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+        self.limits = dict(limits or {})
+        self.default_limits = default_limits
+        self._clients = {}
+        self._transports = {}
+        self._counters = {}
+
+    def client(self, service_name: str) -> httpx.AsyncClient:
+        """Return the shared client for ``service_name``, creating it on first use."""
+        client = self._clients.get(service_name)
+        if client is None:
+            limits = self.limits.get(service_name, self.default_limits)
+            transport = httpx.AsyncHTTPTransport(http2=self.http2, limits=limits)
+            self._counters[service_name] = {"requests": 0, "tcp_connects": 0, "tls_handshakes": 0}
+            client = httpx.AsyncClient(
+                transport=transport,
+                event_hooks={"request": [self._request_hook(service_name)]},
+            )
+            self._transports[service_name] = transport
+            self._clients[service_name] = client
+        return client
+
+    def _request_hook(self, service_name: str):
+        counters = self._counters[service_name]
+
+        async def trace(event_name, info):
+            if event_name == TCP_CONNECT_EVENT:
+                counters["tcp_connects"] += 1
+            elif event_name == TLS_HANDSHAKE_EVENT:
+                counters["tls_handshakes"] += 1
+
+        async def on_request(request: httpx.Request):
+            counters["requests"] += 1
+            request.extensions["trace"] = trace
+
+        return on_request
+
+    def stats(self) -> dict:
+        """Per-upstream request/handshake counters and current pool occupancy."""
+        stats = {}
+        for service_name, transport in self._transports.items():
+            limits = self.limits.get(service_name, self.default_limits)
+            # httpx does not expose the underlying httpcore pool publicly
+            pool = getattr(transport, "_pool", None)
+            connections = list(getattr(pool, "connections", []))
+            active = sum(1 for conn in connections if not conn.is_idle())
+            stats[service_name] = {
+                **self._counters[service_name],
+                "connections": len(connections),
+                "active": active,
+                "idle": len(connections) - active,
+                "max_connections": limits.max_connections,
+                "max_keepalive_connections": limits.max_keepalive_connections,
+                "http2": self.http2,
+            }
+        return stats
+
+    async def aclose(self):
+        """Close every client and its pooled connections."""
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+        self._transports.clear()
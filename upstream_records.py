@@ -0,0 +1,212 @@
+import os
+import re
+from typing import NamedTuple, Optional
+
+
+class FlightOffer(NamedTuple):
+    id: Optional[str]
+    booking_token: Optional[str]
+    link: Optional[str]
+    airline: Optional[str]
+    flight_number: Optional[str]
+    departure_time: Optional[str]
+    arrival_time: Optional[str]
+    duration: Optional[str]
+    stops: Optional[int]
+    price: Optional[float]
+    currency: Optional[str]
+
+
+class HotelOffer(NamedTuple):
+    id: Optional[str]
+    link: Optional[str]
+    name: Optional[str]
+    address: Optional[str]
+    rating: Optional[float]
+    price: Optional[float]
+    currency: Optional[str]
+
+
+class TransportQuote(NamedTuple):
+    id: Optional[str]
+    product: Optional[str]
+    duration: Optional[str]
+    distance: Optional[str]
+    price: Optional[float]
+    currency: Optional[str]
+
+
+class RouteSummary(NamedTuple):
+    summary: Optional[str]
+    distance: Optional[str]
+    duration: Optional[str]
+
+
+# Upstream field names tried, in order, for each record field
+FIELD_ALIASES = {
+    "id": ("id", "offer_id", "product_id", "hotel_id", "property_token"),
+    "booking_token": ("booking_token", "departure_token", "token"),
+    "link": ("link", "url", "booking_url", "deep_link"),
+    "airline": ("airline", "carrier", "airline_name"),
+    "flight_number": ("flight_number", "flight_no", "number"),
+    "departure_time": ("departure_time", "departure", "depart_at", "departs_at"),
+    "arrival_time": ("arrival_time", "arrival", "arrive_at", "arrives_at"),
+    "duration": ("duration", "total_duration", "travel_time", "eta"),
+    "stops": ("stops", "num_stops", "layovers"),
+    "price": ("price", "total_price", "fare", "amount", "estimate", "low_estimate", "rate"),
+    "currency": ("currency", "currency_code"),
+    "name": ("name", "hotel_name", "title"),
+    "address": ("address", "location", "neighborhood"),
+    "rating": ("rating", "stars", "review_score"),
+    "product": ("product", "display_name", "localized_display_name", "type", "name"),
+    "distance": ("distance", "total_distance"),
+    "summary": ("summary", "route", "name"),
+}
+
+# Keys under which upstreams return their list of offers
+LIST_KEYS = ("flights", "hotels", "prices", "routes", "results", "offers", "options", "items", "data")
+
+RECORD_TYPES = {
+    "Flights": FlightOffer,
+    "Hotels": HotelOffer,
+    "Transport": TransportQuote,
+    "Maps": RouteSummary,
+}
+
+# Keep only the cheapest N offers per service ("cheapest N"); maps keeps the
+# first route alternatives in upstream order
+RESULT_LIMITS = {
+    "Flights": int(os.getenv("FLIGHT_RESULT_LIMIT", "5")),
+    "Hotels": int(os.getenv("HOTEL_RESULT_LIMIT", "5")),
+    "Transport": int(os.getenv("TRANSPORT_RESULT_LIMIT", "3")),
+    "Maps": int(os.getenv("MAPS_RESULT_LIMIT", "1")),
+}
+# Opt-in: compaction changes the /plan-trip response shape for existing clients
+COMPACT_PAYLOADS = os.getenv("COMPACT_UPSTREAM_PAYLOADS", "0") == "1"
+
+
+def _number(value) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, dict):
+        return _number(value.get("amount", value.get("value")))
+    if isinstance(value, str):
+        match = re.search(r"\d[\d,]*(?:\.\d+)?", value)
+        if match:
+            return float(match.group().replace(",", ""))
+    return None
+
+
+def _text(value) -> Optional[str]:
+    if value is None or isinstance(value, (dict, list)):
+        return None
+    return str(value)
+
+
+def _field(raw: dict, field: str):
+    for alias in FIELD_ALIASES.get(field, (field,)):
+        if raw.get(alias) is not None:
+            return raw[alias]
+    return None
+
+
+def _offers(response) -> Optional[list]:
+    """The list of offer dicts in an upstream response, or None if there is none."""
+    if isinstance(response, list):
+        return [item for item in response if isinstance(item, dict)]
+    if isinstance(response, dict):
+        for key in LIST_KEYS:
+            value = response.get(key)
+            if isinstance(value, list):
+                return [item for item in value if isinstance(item, dict)]
+            if isinstance(value, dict):
+                nested = _offers(value)
+                if nested is not None:
+                    return nested
+    return None
+
+
+def _currency(raw: dict) -> Optional[str]:
+    currency = _field(raw, "currency")
+    if currency is not None:
+        return _text(currency)
+    price = _field(raw, "price")
+    if isinstance(price, dict):
+        return _text(price.get("currency"))
+    if isinstance(price, str):
+        # "$123" style prices carry their currency as a symbol
+        return CURRENCY_SYMBOLS.get(price.strip()[:1])
+    return None
+
+
+def _stops(value) -> Optional[int]:
+    value = len(value) if isinstance(value, list) else _number(value)
+    return int(value) if value is not None else None
+
+
+CURRENCY_SYMBOLS = {"$": "USD", "€": "EUR", "£": "GBP"}
+FIELD_PARSERS = {"price": _number, "rating": _number, "stops": _stops}
+
+
+def to_record(service_name: str, raw: dict):
+    record_type = RECORD_TYPES[service_name]
+    values = []
+    for field in record_type._fields:
+        if field == "currency":
+            values.append(_currency(raw))
+        else:
+            values.append(FIELD_PARSERS.get(field, _text)(_field(raw, field)))
+    return record_type(*values)
+
+
+def compact_result(service_name: str, response, limit: int = None):
+    """Project an upstream response onto compact records, cheapest first.
+
+    Returns ``{"offers": [...], "total": n}`` with each offer holding only the
+    non-empty fields of the service's record type, including the upstream id,
+    booking token or link needed to act on it. Responses without a
+    recognizable list of offers, and error results, are returned unchanged.
+    """
+    if service_name not in RECORD_TYPES or (isinstance(response, dict) and "error" in response):
+        return response
+    raw_offers = _offers(response)
+    if raw_offers is None:
+        return response
+
+    selected = raw_offers
+    if service_name != "Maps":
+        # Rank on price alone and build full records only for the offers kept
+        prices = [_number(_field(raw, "price")) for raw in raw_offers]
+        order = sorted(range(len(raw_offers)), key=lambda i: (prices[i] is None, prices[i] or 0.0))
+        selected = [raw_offers[i] for i in order]
+    limit = RESULT_LIMITS.get(service_name) if limit is None else limit
+    if limit is not None and limit > 0:
+        selected = selected[:limit]
+    records = [to_record(service_name, raw) for raw in selected]
+    return {
+        "offers": [{k: v for k, v in record._asdict().items() if v is not None} for record in records],
+        "total": len(raw_offers),
+    }
+
+
+def limit_offers(itinerary: dict, limit: int) -> dict:
+    """Each section as compact records, trimmed to its ``limit`` cheapest offers.
+
+    Works whether or not the sections were already compacted, so ``?limit=``
+    behaves the same with ``COMPACT_UPSTREAM_PAYLOADS`` on or off.
+    """
+    services = {service_name.lower(): service_name for service_name in RECORD_TYPES}
+    limited = {}
+    for section, result in itinerary.items():
+        service_name = services.get(section)
+        if service_name is None:
+            limited[section] = result
+            continue
+        compacted = compact_result(service_name, result, limit)
+        if isinstance(result, dict) and set(result) == {"offers", "total"}:
+            # Already compact: keep the upstream's total, not the kept count
+            compacted = {**compacted, "total": result["total"]}
+        limited[section] = compacted
+    return limited
@@ -1,29 +1,65 @@
-from flask import Flask, request, jsonify
-import httpx
-import asyncio
+from flask import Flask, Response, request, jsonify
+from flask.json.provider import DefaultJSONProvider
+import atexit
+import concurrent.futures
 import logging
+import os
+
+from admission import BATCH, INTERACTIVE, AdmissionController, Overloaded
+import fastjson
+from async_bridge import AsyncBridge
+from instrumentation import PROMETHEUS_CONTENT_TYPE, REGISTRY, recent_traces
+from trip_upstreams import MAX_BATCH_TRIPS, create_trip_upstreams, section_statuses, trip_result
+from upstream_records import limit_offers
+
+class FastJSONProvider(DefaultJSONProvider):
+    """jsonify/get_json through orjson when it is installed."""
+
+    def dumps(self, obj, **kwargs):
+        return fastjson.dumps_str(obj)
+
+    def loads(self, s, **kwargs):
+        return fastjson.loads(s)
 
 app = Flask(__name__)
+if fastjson.HAS_ORJSON:
+    app.json = FastJSONProvider(app)
 logging.basicConfig(level=logging.INFO)
 
-# MCP service endpoints
-MAPS_MCP_URL = "https://your-maps-mcp-server.com/api/maps"
-FLIGHT_API_URL = "https://your-flights-api.com/api/flights"
-HOTEL_API_URL = "https://your-hotels-api.com/api/hotels"
-UBER_API_URL = "https://your-transport-api.com/api/uber"
-
-# Async data fetcher
-async def fetch_data(client, url, payload, service_name):
-    try:
-        response = await client.post(url, json=payload, timeout=10)
-        response.raise_for_status()
-        return response.json()
-    except httpx.HTTPError as http_err:
-        logging.error(f"HTTP error in {service_name}: {http_err}")
-        return {"error": f"HTTP error from {service_name}: {str(http_err)}"}
-    except Exception as e:
-        logging.error(f"Unhandled error in {service_name}: {e}")
-        return {"error": f"Unhandled error from {service_name}: {str(e)}"}
+# One event loop and one pooled upstream client per worker process, shared
+# by every request instead of a new loop + client each time
+bridge = AsyncBridge(name="plan-trip-bridge")
+upstreams = create_trip_upstreams()
+bridge.on_shutdown(upstreams.aclose)
+atexit.register(bridge.stop)
+
+# Upper bound on how long a request thread waits for the upstream fan-out
+FANOUT_TIMEOUT = 30
+# Stats are snapshotted on the bridge loop, which owns them
+STATS_TIMEOUT = 5
+
+# Bounds concurrent itineraries; it runs on the bridge loop, so every request
+# thread shares one queue. The excess waits briefly, then gets a 503.
+admission = AdmissionController()
+
+def lane_for(default=INTERACTIVE):
+    """Priority lane from the ``X-Priority`` header (interactive or batch)."""
+    return request.headers.get('X-Priority', default).lower()
+
+async def admitted(lane, make_coro):
+    async with admission.admit(lane):
+        return await make_coro()
+
+@app.errorhandler(Overloaded)
+def overloaded(e):
+    response = jsonify({"error": str(e), "reason": e.reason})
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, 503
+
+@app.errorhandler(concurrent.futures.TimeoutError)
+def bridge_timeout(e):
+    # bridge.run has already cancelled the work on the loop
+    return jsonify({"error": "Timed out waiting for upstream services"}), 504
 
 @app.route('/plan-trip', methods=['POST'])
 def plan_trip():
@@ -32,29 +68,108 @@ def plan_trip():
     if not all(k in data for k in required_keys):
         return jsonify({'error': 'Missing required fields'}), 400
 
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
+    # ?budget_ms= caps the wait on each upstream; ?partial=true returns an
+    # itinerary with per-section status instead of failing on any error
+    budget_ms = request.args.get('budget_ms', type=int)
+    if budget_ms is not None and budget_ms <= 0:
+        return jsonify({'error': 'budget_ms must be a positive integer'}), 400
+    budget = budget_ms / 1000 if budget_ms is not None else None
+    partial = request.args.get('partial', 'false').lower() in ('1', 'true', 'yes')
+    # ?limit=N returns each section as compact records, cheapest N first
+    limit = request.args.get('limit', type=int)
+    if limit is not None and limit <= 0:
+        return jsonify({'error': 'limit must be a positive integer'}), 400
 
-    async def fetch_all():
-        async with httpx.AsyncClient() as client:
-            maps_task = fetch_data(client, MAPS_MCP_URL, data, "Maps")
-            flight_task = fetch_data(client, FLIGHT_API_URL, data, "Flights")
-            hotel_task = fetch_data(client, HOTEL_API_URL, data, "Hotels")
-            uber_task = fetch_data(client, UBER_API_URL, data, "Transport")
-            return await asyncio.gather(maps_task, flight_task, hotel_task, uber_task)
+    itinerary = bridge.run(admitted(lane_for(), lambda: upstreams.fetch_itinerary(data, budget)),
+                           timeout=FANOUT_TIMEOUT)
+    if limit is not None:
+        itinerary = limit_offers(itinerary, limit)
+    sections = section_statuses(itinerary)
 
-    maps, flights, hotels, transport = loop.run_until_complete(fetch_all())
-    itinerary = {
-        "maps": maps,
-        "flights": flights,
-        "hotels": hotels,
-        "transport": transport
-    }
-
-    if any("error" in result for result in [maps, flights, hotels, transport]):
-        return jsonify({"status": "error", "itinerary": itinerary}), 502
+    if "error" in sections.values():
+        if not partial or "ok" not in sections.values():
+            return jsonify({"status": "error", "itinerary": itinerary}), 502
+        return jsonify({"status": "partial", "sections": sections, "itinerary": itinerary})
 
     return jsonify({"status": "success", "itinerary": itinerary})
 
+@app.route('/plan-trips', methods=['POST'])
+def plan_trips():
+    """Plan a batch of trips; results are in input order, each with its own status."""
+    trips = request.get_json()
+    required_keys = ['origin', 'destination', 'start_date', 'end_date', 'num_people']
+    if not isinstance(trips, list) or not 0 < len(trips) <= MAX_BATCH_TRIPS:
+        return jsonify({'error': f'Send a list of 1 to {MAX_BATCH_TRIPS} trips'}), 400
+    if not all(isinstance(trip, dict) and all(k in trip for k in required_keys) for trip in trips):
+        return jsonify({'error': 'Missing required fields'}), 400
+
+    budget_ms = request.args.get('budget_ms', type=int)
+    if budget_ms is not None and budget_ms <= 0:
+        return jsonify({'error': 'budget_ms must be a positive integer'}), 400
+    budget = budget_ms / 1000 if budget_ms is not None else None
+    partial = request.args.get('partial', 'false').lower() in ('1', 'true', 'yes')
+
+    itineraries, stats = bridge.run(admitted(lane_for(BATCH), lambda: upstreams.fetch_itineraries(trips, budget)),
+                                    timeout=FANOUT_TIMEOUT)
+    return jsonify({"results": [trip_result(itinerary, partial) for itinerary in itineraries], "stats": stats})
+
+@app.route('/plan-trip/stream', methods=['POST'])
+def plan_trip_stream():
+    """NDJSON stream: one line per itinerary section as it arrives, then a summary line."""
+    data = request.get_json()
+    required_keys = ['origin', 'destination', 'start_date', 'end_date', 'num_people']
+    if not all(k in data for k in required_keys):
+        return jsonify({'error': 'Missing required fields'}), 400
+
+    budget_ms = request.args.get('budget_ms', type=int)
+    if budget_ms is not None and budget_ms <= 0:
+        return jsonify({'error': 'budget_ms must be a positive integer'}), 400
+    budget = budget_ms / 1000 if budget_ms is not None else None
+
+    # The slot is held until the stream ends or the client goes away
+    bridge.run(admission.acquire(lane_for()), timeout=FANOUT_TIMEOUT)
+    release = admission.releaser()
+
+    def events():
+        try:
+            for event in bridge.iterate(upstreams.stream_itinerary(data, budget), timeout=FANOUT_TIMEOUT):
+                yield fastjson.dumps(event) + b"\n"
+        finally:
+            bridge.call_soon(release)
+
+    response = Response(events(), mimetype="application/x-ndjson")
+    response.call_on_close(lambda: bridge.call_soon(release))
+    return response
+
+@app.route('/admission-stats', methods=['GET'])
+def admission_stats():
+    return jsonify(bridge.call(admission.stats, timeout=STATS_TIMEOUT))
+
+@app.route('/cache-stats', methods=['GET'])
+def cache_stats():
+    return jsonify(bridge.run(upstreams.cache_stats(), timeout=STATS_TIMEOUT))
+
+@app.route('/coalescing-stats', methods=['GET'])
+def coalescing_stats():
+    return jsonify(bridge.call(upstreams.coalescing_stats, timeout=STATS_TIMEOUT))
+
+@app.route('/latency-stats', methods=['GET'])
+def latency_stats():
+    return jsonify(bridge.call(upstreams.latency_stats, timeout=STATS_TIMEOUT))
+
+@app.route('/breaker-stats', methods=['GET'])
+def breaker_stats():
+    return jsonify(bridge.call(upstreams.breaker_stats, timeout=STATS_TIMEOUT))
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(REGISTRY.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+@app.route('/traces', methods=['GET'])
+def traces():
+    return jsonify(recent_traces(request.args.get('limit', 20, type=int)))
+
 if __name__ == '__main__':
-    app.run(host="0.0.0.0", port=8080, debug=True)
+    # The debug reloader/debugger is opt-in; threaded so one slow request
+    # does not hold up the rest
+    app.run(host="0.0.0.0", port=8080, debug=os.getenv("FLASK_DEBUG", "0") == "1", threaded=True)